@@ -5,16 +5,59 @@ Interactive chatbot for querying supply chain data using natural language
 
 import streamlit as st
 import os
+import asyncio
 from dotenv import load_dotenv
-from utils.snowflake_connector import SnowflakeConnector
-from utils.rag_engine import RAGEngine
-from utils.query_router import QueryRouter
-import plotly.express as px
 import pandas as pd
+import numpy as np
+
+# Snowflake, LangChain, sentence-transformers and Plotly are imported where
+# they are first needed so the first page paint does not wait on them
 
 # Load environment variables
 load_dotenv()
 
+# Auto-charts are skipped for results larger than this
+MAX_CHART_ROWS = 5000
+
+EXAMPLE_QUESTIONS = [
+    "What were the top 5 products by revenue?",
+    "Show sales trends for electronics",
+    "Which stores are underperforming?",
+    "What's the total revenue by category?",
+    "Forecast demand for next quarter"
+]
+
+
+def get_query_router():
+    """Create the RAG engine and query router once per session"""
+    from utils.rag_engine import RAGEngine
+    from utils.query_router import QueryRouter
+    
+    # Initialize RAG engine if not exists
+    if "rag_engine" not in st.session_state:
+        st.session_state.rag_engine = RAGEngine()
+    
+    # Initialize query router
+    if "query_router" not in st.session_state:
+        # Schema info comes from the connector's cache, keyed by account and role
+        st.session_state.query_router = QueryRouter(
+            st.session_state.sf_connector,
+            st.session_state.rag_engine
+        )
+    
+    # Pre-embed the example questions once so repeat clicks
+    # hit the semantic response cache without a model call
+    if "_examples_embedded" not in st.session_state:
+        st.session_state.query_router.prime_embeddings(EXAMPLE_QUESTIONS)
+        st.session_state._examples_embedded = True
+    
+    return st.session_state.query_router
+
+
+async def warm_cache(router):
+    """Answer all example questions concurrently to fill the response cache"""
+    return await asyncio.gather(*[router._aprocess_query(q) for q in EXAMPLE_QUESTIONS])
+
 # Page configuration
 st.set_page_config(
     page_title="Supply Chain Analytics Chatbot",
@@ -61,6 +104,8 @@ with st.sidebar:
         if st.button("🔌 Connect to Snowflake"):
             with st.spinner("Connecting..."):
                 try:
+                    from utils.snowflake_connector import SnowflakeConnector
+                    
                     connector = SnowflakeConnector(
                         account=sf_account,
                         user=sf_user,
@@ -68,6 +113,8 @@ with st.sidebar:
                         database=sf_database,
                         schema=sf_schema
                     )
+                    # Start the schema scan now; it runs while the RAG engine loads
+                    connector.prefetch_schema_info()
                     st.session_state.sf_connector = connector
                     st.session_state.snowflake_connected = True
                     st.success("✅ Connected!")
@@ -104,18 +151,21 @@ with st.sidebar:
     
     # Example questions
     st.subheader("💡 Try asking:")
-    example_questions = [
-        "What were the top 5 products by revenue?",
-        "Show sales trends for electronics",
-        "Which stores are underperforming?",
-        "What's the total revenue by category?",
-        "Forecast demand for next quarter"
-    ]
     
-    for q in example_questions:
+    for q in EXAMPLE_QUESTIONS:
         if st.button(q, key=f"example_{q}", use_container_width=True):
-            st.session_state.messages.append({"role": "user", "content": q})
-            st.rerun()
+            # Answered below through the same path as typed questions
+            st.session_state.pending_prompt = q
+    
+    if st.button("🔥 Warm cache", use_container_width=True,
+                 disabled=not st.session_state.snowflake_connected):
+        with st.spinner("Answering example questions..."):
+            results = asyncio.run(warm_cache(get_query_router()))
+        failed = sum("error" in r for r in results)
+        if failed:
+            st.warning(f"⚠️ {failed} of {len(results)} example questions failed")
+        else:
+            st.success(f"✅ Cached {len(results)} example answers")
 
 # Main content
 st.title("📊 Supply Chain Analytics Chatbot")
@@ -148,20 +198,21 @@ chat_container = st.container()
 
 with chat_container:
     # Display chat history
-    for message in st.session_state.messages:
+    for i, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
             
             # Display chart if present
             if "chart" in message:
-                st.plotly_chart(message["chart"], use_container_width=True)
+                st.plotly_chart(message["chart"], use_container_width=True, key=f"chart_{i}")
             
             # Display dataframe if present
             if "dataframe" in message:
                 st.dataframe(message["dataframe"], use_container_width=True)
 
 # Chat input
-if prompt := st.chat_input("Ask about your supply chain data..."):
+prompt = st.chat_input("Ask about your supply chain data...") or st.session_state.pop("pending_prompt", None)
+if prompt:
     # Add user message
     st.session_state.messages.append({"role": "user", "content": prompt})
     
@@ -177,19 +228,8 @@ if prompt := st.chat_input("Ask about your supply chain data..."):
                     st.markdown(response)
                     st.session_state.messages.append({"role": "assistant", "content": response})
                 else:
-                    # Initialize RAG engine if not exists
-                    if "rag_engine" not in st.session_state:
-                        st.session_state.rag_engine = RAGEngine()
-                    
-                    # Initialize query router
-                    if "query_router" not in st.session_state:
-                        st.session_state.query_router = QueryRouter(
-                            st.session_state.sf_connector,
-                            st.session_state.rag_engine
-                        )
-                    
                     # Process query
-                    result = st.session_state.query_router.process_query(prompt)
+                    result = get_query_router().process_query(prompt)
                     
                     # Display response
                     st.markdown(result["answer"])
@@ -202,19 +242,29 @@ if prompt := st.chat_input("Ask about your supply chain data..."):
                     
                     # Display and store chart if present
                     if "dataframe" in result and result["dataframe"] is not None:
+                        import plotly.express as px
+                        
                         df = result["dataframe"]
                         
                         # Auto-generate chart based on data
-                        if len(df.columns) >= 2:
+                        if not df.empty and df.shape[1] >= 2 and len(df) <= MAX_CHART_ROWS:
                             # Try to create an appropriate chart
-                            if df.select_dtypes(include=['number']).shape[1] > 0:
-                                numeric_col = df.select_dtypes(include=['number']).columns[0]
-                                categorical_col = df.select_dtypes(exclude=['number']).columns[0] if len(df.select_dtypes(exclude=['number']).columns) > 0 else df.columns[0]
+                            num_cols = df.select_dtypes(include='number').columns
+                            cat_cols = df.columns.difference(num_cols, sort=False)
+                            if len(num_cols) > 0:
+                                numeric_col = num_cols[0]
+                                categorical_col = cat_cols[0] if len(cat_cols) > 0 else df.columns[0]
                                 
-                                fig = px.bar(df.head(10), x=categorical_col, y=numeric_col, 
-                                           title=f"{numeric_col} by {categorical_col}")
-                                st.plotly_chart(fig, use_container_width=True)
-                                message["chart"] = fig
+                                # A flat series makes an uninformative bar chart
+                                values = df[numeric_col]
+                                if not np.isclose(values.max(), values.min()):
+                                    plot_df = df.nlargest(10, numeric_col)[[categorical_col, numeric_col]]
+                                    fig = px.bar(plot_df, x=categorical_col, y=numeric_col, 
+                                               title=f"{numeric_col} by {categorical_col}")
+                                    chart_key = f"chart_{len(st.session_state.messages)}"
+                                    st.plotly_chart(fig, use_container_width=True, key=chart_key)
+                                    # Store the plain dict spec; replays skip figure rebuilding
+                                    message["chart"] = fig.to_dict()
                         
                         # Show data table
                         st.dataframe(df.head(20), use_container_width=True)
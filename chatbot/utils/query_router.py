@@ -3,18 +3,132 @@ Query router to intelligently route questions to SQL generation or RAG retrieval
 """
 
 import os
-from typing import Dict, Any, Optional
+import asyncio
+import re
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:  # Fall back to regex checks
+    sqlglot = None
+
+CLASSIFY_TEMPLATE = """
+Classify the following user question into one of these categories:
+- data_query: Questions that need data from database (sales, revenue, products, etc.)
+- explanation: Questions about how things work, definitions, business rules
+- general: General conversation or greetings
+
+Question: {query}
+
+Respond with only one word: data_query, explanation, or general
+"""
+
+SQL_TEMPLATE = """
+You are a SQL expert. Generate a Snowflake SQL query to answer the user's question.
+
+Database Schema:
+{schema}
+
+Relevant Context:
+{context}
+
+User Question: {query}
+
+Rules:
+1. Use fully qualified table names (SUPPLY_CHAIN_ANALYTICS.MARTS_MARTS.table_name)
+2. Include appropriate JOINs based on foreign keys
+3. Use aggregate functions when asking for totals, averages, etc.
+4. Add ORDER BY and LIMIT clauses when asking for "top" items
+5. Use date functions for time-based analysis
+6. Return ONLY the SQL query, no explanations
+
+SQL Query:
+"""
+
+ROUTE_TEMPLATE = """
+You are a SQL expert and analytics assistant for a supply chain database.
+
+Classify the user's question into one of these intents:
+- data_query: Questions that need data from database (sales, revenue, products, etc.)
+- explanation: Questions about how things work, definitions, business rules
+- general: General conversation or greetings
+
+Database Schema:
+{schema}
+
+Relevant Context:
+{context}
+
+User Question: {query}
+
+For data_query, write a Snowflake SQL query following these rules:
+1. Use fully qualified table names (SUPPLY_CHAIN_ANALYTICS.MARTS_MARTS.table_name)
+2. Include appropriate JOINs based on foreign keys
+3. Use aggregate functions when asking for totals, averages, etc.
+4. Add ORDER BY and LIMIT clauses when asking for "top" items
+5. Use date functions for time-based analysis
+
+For explanation, write a clear, helpful answer based on the context.
+
+Respond with ONLY a JSON object, no other text, in one of these forms:
+{{"intent": "data_query", "sql": "<SQL query>"}}
+{{"intent": "explanation", "answer": "<answer>"}}
+{{"intent": "general"}}
+"""
+
+EXPLAIN_TEMPLATE = """
+Use the following context to answer the user's question.
+
+Context:
+{context}
+
+Question: {query}
+
+Provide a clear, helpful answer based on the context.
+"""
+
+QUERY_INTENTS = ("data_query", "explanation", "general")
+
+# Maximum number of prompt classifications remembered per router
+CLASSIFY_CACHE_SIZE = 512
+
+# Cosine similarity above which a previous prompt is treated as the same question
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Maximum number of responses remembered per router, and how long (seconds)
+# each stays valid before the warehouse is queried again
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = int(os.getenv("SCAP_RESPONSE_CACHE_TTL", "900"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Row cap appended to generated SELECTs that have no LIMIT of their own
+SQL_MAX_ROWS = int(os.getenv("SCAP_SQL_MAX_ROWS", "1000"))
+
+_LIMIT_RE = re.compile(r"\blimit\s+\d+|\bfetch\s+(?:first|next)\b|\btop\s+\d+", re.IGNORECASE)
+_GROUP_BY_RE = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+
+# Opening ``` / ```sql fence and closing ``` fence, tolerating surrounding whitespace
+_SQL_FENCE_RE = re.compile(r"\A\s*```(?:sql)?\s*|\s*```\s*\Z", re.IGNORECASE)
+
+GENERAL_ANSWER = "Hello! I'm your Supply Chain Analytics assistant. I can help you analyze sales data, product performance, store metrics, and more. What would you like to know?"
+
 
 class QueryRouter:
     """Route user queries to appropriate handlers and generate responses"""
     
-    def __init__(self, snowflake_connector, rag_engine):
+    def __init__(self, snowflake_connector, rag_engine,
+                 schema_info: Optional[Dict[str, Any]] = None):
         """Initialize query router"""
         self.sf_connector = snowflake_connector
         self.rag_engine = rag_engine
@@ -26,7 +140,9 @@ class QueryRouter:
             self.llm = ChatAnthropic(
                 model="claude-3-haiku-20240307",  # ✅ Haiku (cheap!) not Sonnet (expensive!)
                 temperature=0,
-                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
+                anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=2,
+                timeout=30
             )
             self.llm_provider = "Claude 3 Haiku"
         elif os.getenv("GROQ_API_KEY"):
@@ -42,81 +158,219 @@ class QueryRouter:
             self.llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
             self.llm_provider = "OpenAI"
         
-        # Get schema information
-        self.schema_info = self.sf_connector.get_schema_info()
+        # Build prompt chains once and reuse them for every query
+        parser = StrOutputParser()
+        self._classify_chain = ChatPromptTemplate.from_template(CLASSIFY_TEMPLATE) | self.llm | parser
+        self._sql_chain = ChatPromptTemplate.from_template(SQL_TEMPLATE) | self.llm | parser
+        self._route_chain = ChatPromptTemplate.from_template(ROUTE_TEMPLATE) | self.llm | parser
+        self._explain_chain = ChatPromptTemplate.from_template(EXPLAIN_TEMPLATE) | self.llm | parser
+        
+        # Get schema information (callers may pass an already-cached copy)
+        self.schema_info = schema_info if schema_info is not None else self.sf_connector.get_schema_info()
+        self._schema_str = self._format_schema_info()
+        
+        # LRU of normalized prompt -> (stored_at, embedding, response), looked up
+        # by exact match, then semantic match on the embeddings (dot product ==
+        # cosine, vectors are normalized); entries expire after RESPONSE_CACHE_TTL
+        self._response_cache: "OrderedDict[str, Tuple[float, np.ndarray, Dict[str, Any]]]" = OrderedDict()
+        
+        # LRU of prompt -> intent for the separate classification call
+        self._cls_cache: "OrderedDict[str, str]" = OrderedDict()
+        
+        # Embeddings computed ahead of time for known prompts (e.g. examples)
+        self._query_embeds: Dict[str, np.ndarray] = {}
     
-    def _classify_query(self, query: str) -> str:
-        """Classify query type: data_query, explanation, or general"""
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normalize a prompt for exact-match cache lookups"""
+        return _WHITESPACE_RE.sub(" ", query.strip().lower())
+    
+    @staticmethod
+    def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a cached result so callers cannot mutate the cached DataFrame"""
+        result = dict(result)
+        if result.get("dataframe") is not None:
+            result["dataframe"] = result["dataframe"].copy()
+        return result
+    
+    def prime_embeddings(self, queries: List[str]) -> None:
+        """Embed known prompts in one batch so their cache lookups skip the model"""
+        keys = [self._normalize_query(q) for q in queries]
+        vectors = np.asarray(self.rag_engine.embeddings.embed_documents(keys), dtype=np.float32)
+        self._query_embeds.update(zip(keys, vectors))
+    
+    def _lookup_cache(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Look up a cached response, returning it with the prompt embedding"""
+        cache = self._response_cache
+        expired_before = time.monotonic() - RESPONSE_CACHE_TTL
+        for stale in [k for k, (stored_at, _, _) in cache.items() if stored_at < expired_before]:
+            del cache[stale]
+        
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key][2], None
+        
+        vec = self._query_embeds.get(key)
+        if vec is None:
+            vec = np.asarray(self.rag_engine.embeddings.embed_query(key), dtype=np.float32)
         
-        classification_prompt = ChatPromptTemplate.from_template("""
-        Classify the following user question into one of these categories:
-        - data_query: Questions that need data from database (sales, revenue, products, etc.)
-        - explanation: Questions about how things work, definitions, business rules
-        - general: General conversation or greetings
+        if cache:
+            keys = list(cache)
+            scores = np.stack([entry[1] for entry in cache.values()]) @ vec
+            best = int(np.argmax(scores))
+            if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+                cache.move_to_end(keys[best])
+                return cache[keys[best]][2], vec
         
-        Question: {query}
+        return None, vec
+    
+    def _store_cache(self, key: str, vec: np.ndarray, result: Dict[str, Any]) -> None:
+        """Store a successful response in the LRU, evicting the oldest entry if full"""
+        self._response_cache[key] = (time.monotonic(), vec, result)
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+    
+    def _classify_query(self, query: str) -> str:
+        """Classify query type: data_query, explanation, or general"""
+        key = self._normalize_query(query)
+        if key in self._cls_cache:
+            self._cls_cache.move_to_end(key)
+            return self._cls_cache[key]
         
-        Respond with only one word: data_query, explanation, or general
-        """)
+        classification = self._classify_chain.invoke({"query": query}).strip().lower()
+        return self._remember_classification(key, classification)
+    
+    async def _aclassify_query(self, query: str) -> str:
+        """Async version of _classify_query"""
+        key = self._normalize_query(query)
+        if key in self._cls_cache:
+            self._cls_cache.move_to_end(key)
+            return self._cls_cache[key]
         
-        chain = classification_prompt | self.llm | StrOutputParser()
-        classification = chain.invoke({"query": query}).strip().lower()
+        classification = (await self._classify_chain.ainvoke({"query": query})).strip().lower()
+        return self._remember_classification(key, classification)
+    
+    def _remember_classification(self, key: str, classification: str) -> str:
+        """Store a classification in the LRU, evicting the oldest entry if full"""
+        self._cls_cache[key] = classification
+        if len(self._cls_cache) > CLASSIFY_CACHE_SIZE:
+            self._cls_cache.popitem(last=False)
         
         return classification
     
     def _generate_sql(self, query: str, context: str) -> str:
         """Generate SQL query from natural language"""
         
-        schema_str = self._format_schema_info()
+        sql_query = self._sql_chain.invoke({
+            "schema": self._schema_str,
+            "context": context,
+            "query": query
+        })
+        
+        return self._clean_sql(sql_query)
+    
+    async def _agenerate_sql(self, query: str, context: str) -> str:
+        """Async version of _generate_sql"""
+        
+        sql_query = await self._sql_chain.ainvoke({
+            "schema": self._schema_str,
+            "context": context,
+            "query": query
+        })
+        
+        return self._clean_sql(sql_query)
+    
+    @staticmethod
+    def _clean_sql(sql_query: str) -> str:
+        """Strip markdown code fences from LLM-generated SQL and bound its result size"""
+        sql_query = _SQL_FENCE_RE.sub("", sql_query).strip()
+        return QueryRouter._apply_row_limit(sql_query)
+    
+    @staticmethod
+    def _apply_row_limit(sql_query: str) -> str:
+        """Append LIMIT SQL_MAX_ROWS to a non-aggregate SELECT without a LIMIT"""
+        needs_limit = None
         
-        sql_prompt = ChatPromptTemplate.from_template("""
-        You are a SQL expert. Generate a Snowflake SQL query to answer the user's question.
+        if sqlglot is not None:
+            try:
+                tree = sqlglot.parse_one(sql_query, read="snowflake")
+                needs_limit = (
+                    isinstance(tree, exp.Select)
+                    and not tree.args.get("limit")
+                    and not tree.args.get("fetch")
+                    and not tree.args.get("group")
+                )
+            except sqlglot.errors.SqlglotError:
+                pass
         
-        Database Schema:
-        {schema}
+        if needs_limit is None:
+            needs_limit = (
+                sql_query.lstrip().upper().startswith(("SELECT", "WITH"))
+                and not _LIMIT_RE.search(sql_query)
+                and not _GROUP_BY_RE.search(sql_query)
+            )
         
-        Relevant Context:
-        {context}
+        if not needs_limit:
+            return sql_query
         
-        User Question: {query}
+        # Append on a new line so a trailing comment cannot swallow the LIMIT
+        return f"{sql_query.rstrip().rstrip(';').rstrip()}\nLIMIT {SQL_MAX_ROWS}"
+    
+    def _route_and_generate(self, query: str, context: str) -> Optional[Dict[str, str]]:
+        """Classify the query and produce its SQL or answer in a single LLM call
         
-        Rules:
-        1. Use fully qualified table names (SUPPLY_CHAIN_ANALYTICS.MARTS_MARTS.table_name)
-        2. Include appropriate JOINs based on foreign keys
-        3. Use aggregate functions when asking for totals, averages, etc.
-        4. Add ORDER BY and LIMIT clauses when asking for "top" items
-        5. Use date functions for time-based analysis
-        6. Return ONLY the SQL query, no explanations
+        Returns None when the model's reply is not the expected JSON, so the
+        caller can fall back to the separate classify/generate calls.
+        """
         
-        SQL Query:
-        """)
+        reply = self._route_chain.invoke({
+            "schema": self._schema_str,
+            "context": context,
+            "query": query
+        })
+        return self._parse_route(reply)
+    
+    async def _aroute_and_generate(self, query: str, context: str) -> Optional[Dict[str, str]]:
+        """Async version of _route_and_generate"""
         
-        chain = sql_prompt | self.llm | StrOutputParser()
-        sql_query = chain.invoke({
-            "schema": schema_str,
+        reply = await self._route_chain.ainvoke({
+            "schema": self._schema_str,
             "context": context,
             "query": query
         })
+        return self._parse_route(reply)
+    
+    @staticmethod
+    def _parse_route(reply: str) -> Optional[Dict[str, str]]:
+        """Parse and validate the JSON reply of the routing prompt"""
+        
+        # Tolerate code fences or stray text around the JSON object
+        try:
+            routed = json.loads(reply[reply.find("{"):reply.rfind("}") + 1])
+        except json.JSONDecodeError:
+            return None
         
-        # Clean up the SQL
-        sql_query = sql_query.strip()
-        if sql_query.startswith("```sql"):
-            sql_query = sql_query[6:]
-        if sql_query.startswith("```"):
-            sql_query = sql_query[3:]
-        if sql_query.endswith("```"):
-            sql_query = sql_query[:-3]
+        if not isinstance(routed, dict):
+            return None
+        intent = str(routed.get("intent", "")).strip().lower()
+        if intent not in QUERY_INTENTS:
+            return None
+        if intent == "data_query" and not routed.get("sql"):
+            return None
+        if intent == "explanation" and not routed.get("answer"):
+            return None
         
-        return sql_query.strip()
+        routed["intent"] = intent
+        return routed
     
     def _format_schema_info(self) -> str:
         """Format schema information as string"""
-        schema_str = ""
+        parts = []
         for table_name, columns in self.schema_info.items():
-            schema_str += f"\n{table_name}:\n"
-            for col in columns:
-                schema_str += f"  - {col['COLUMN_NAME']} ({col['DATA_TYPE']})\n"
-        return schema_str
+            parts.append(f"\n{table_name}:\n")
+            parts.extend(f"  - {col['COLUMN_NAME']} ({col['DATA_TYPE']})\n" for col in columns)
+        return "".join(parts)
     
     def _generate_natural_response(self, query: str, df: Optional[pd.DataFrame], 
                                    sql_query: Optional[str] = None) -> str:
@@ -126,55 +380,67 @@ class QueryRouter:
             return "I couldn't find any data matching your query. Please try rephrasing your question."
         
         # Create summary of results
-        summary = f"Found {len(df)} results. "
+        parts = [f"Found {len(df)} results. "]
         
         if len(df.columns) >= 2:
             # Describe the data
             numeric_cols = df.select_dtypes(include=['number']).columns
             if len(numeric_cols) > 0:
                 first_numeric = numeric_cols[0]
-                summary += f"The total {first_numeric} is {df[first_numeric].sum():,.2f}. "
+                parts.append(f"The total {first_numeric} is {df[first_numeric].sum():,.2f}. ")
                 
                 if len(df) <= 10:
-                    summary += f"Here are all the results:\n\n"
-                    for idx, row in df.head(10).iterrows():
-                        summary += f"• {row.iloc[0]}: {row.iloc[1]:,.2f}\n"
+                    rows = df.head(10)
+                    parts.append("Here are all the results:\n\n")
+                    parts.extend(
+                        f"• {label}: {value:,.2f}\n"
+                        for label, value in zip(rows.iloc[:, 0].to_numpy(), rows.iloc[:, 1].to_numpy())
+                    )
                 else:
-                    summary += f"Top 10 results shown below."
+                    parts.append("Top 10 results shown below.")
         
-        return summary
+        return "".join(parts)
     
     def process_query(self, query: str) -> Dict[str, Any]:
         """Main entry point to process user queries"""
         
+        key = self._normalize_query(query)
+        try:
+            cached, vec = self._lookup_cache(key)
+        except Exception:
+            # Embedding failed; answer uncached so errors still come back as results
+            cached, vec = None, None
+        if cached is not None:
+            return self._copy_result(cached)
+        
+        result = self._answer_query(query)
+        
+        if "error" not in result and vec is not None:
+            self._store_cache(key, vec, result)
+            result = self._copy_result(result)
+        
+        return result
+    
+    def _answer_query(self, query: str) -> Dict[str, Any]:
+        """Run the retrieve -> route/generate -> execute pipeline for a query"""
+        
         try:
-            # Classify query
-            query_type = self._classify_query(query)
-            
-            if query_type == "general":
-                return {
-                    "answer": "Hello! I'm your Supply Chain Analytics assistant. I can help you analyze sales data, product performance, store metrics, and more. What would you like to know?",
-                    "dataframe": None
-                }
-            
             # Get relevant context from RAG
             context = self.rag_engine.get_relevant_context(query)
             
+            # Classify and generate in one call; fall back to separate calls
+            routed = self._route_and_generate(query, context)
+            query_type = routed["intent"] if routed else self._classify_query(query)
+            
+            if query_type == "general":
+                return {"answer": GENERAL_ANSWER, "dataframe": None}
+            
             if query_type == "explanation":
                 # Use RAG context directly for explanations
-                explanation_prompt = ChatPromptTemplate.from_template("""
-                Use the following context to answer the user's question.
-                
-                Context:
-                {context}
-                
-                Question: {query}
-                
-                Provide a clear, helpful answer based on the context.
-                """)
-                
-                chain = explanation_prompt | self.llm | StrOutputParser()
-                answer = chain.invoke({"context": context, "query": query})
+                if routed:
+                    answer = routed["answer"]
+                else:
+                    answer = self._explain_chain.invoke({"context": context, "query": query})
                 
                 return {
                     "answer": answer,
@@ -182,26 +448,98 @@ class QueryRouter:
                 }
             
             # For data queries, generate and execute SQL
-            sql_query = self._generate_sql(query, context)
+            if routed:
+                sql_query = self._clean_sql(routed["sql"])
+            else:
+                sql_query = self._generate_sql(query, context)
             
             # Execute query
             df = self.sf_connector.execute_query(sql_query)
             
-            # Generate natural language response
-            answer = self._generate_natural_response(query, df, sql_query)
+            return self._data_result(query, sql_query, df)
+            
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def _aprocess_query(self, query: str) -> Dict[str, Any]:
+        """Async version of process_query, so independent prompts can overlap
+        
+        LLM calls go through the chains' native ainvoke; RAG retrieval and
+        Snowflake execution are blocking and run in worker threads.
+        """
+        
+        key = self._normalize_query(query)
+        try:
+            cached, vec = self._lookup_cache(key)
+        except Exception:
+            # Embedding failed; answer uncached so errors still come back as results
+            cached, vec = None, None
+        if cached is not None:
+            return self._copy_result(cached)
+        
+        result = await self._aanswer_query(query)
+        
+        if "error" not in result and vec is not None:
+            self._store_cache(key, vec, result)
+            result = self._copy_result(result)
+        
+        return result
+    
+    async def _aanswer_query(self, query: str) -> Dict[str, Any]:
+        """Async version of _answer_query"""
+        
+        try:
+            context = await asyncio.to_thread(self.rag_engine.get_relevant_context, query)
+            
+            routed = await self._aroute_and_generate(query, context)
+            query_type = routed["intent"] if routed else await self._aclassify_query(query)
+            
+            if query_type == "general":
+                return {"answer": GENERAL_ANSWER, "dataframe": None}
             
-            # Add SQL query to response (for transparency)
-            answer += f"\n\n<details>\n<summary>SQL Query Used</summary>\n\n```sql\n{sql_query}\n```\n</details>"
+            if query_type == "explanation":
+                if routed:
+                    answer = routed["answer"]
+                else:
+                    answer = await self._explain_chain.ainvoke({"context": context, "query": query})
+                
+                return {
+                    "answer": answer,
+                    "dataframe": None
+                }
             
-            return {
-                "answer": answer,
-                "dataframe": df,
-                "sql_query": sql_query
-            }
+            if routed:
+                sql_query = self._clean_sql(routed["sql"])
+            else:
+                sql_query = await self._agenerate_sql(query, context)
+            
+            df = await asyncio.to_thread(self.sf_connector.execute_query, sql_query)
+            
+            return self._data_result(query, sql_query, df)
             
         except Exception as e:
-            return {
-                "answer": f"I encountered an error processing your query: {str(e)}\n\nPlease try rephrasing your question or check the Snowflake connection.",
-                "dataframe": None,
-                "error": str(e)
-            }
+            return self._error_result(e)
+    
+    def _data_result(self, query: str, sql_query: str, df: Optional[pd.DataFrame]) -> Dict[str, Any]:
+        """Build the response for an executed data query"""
+        
+        # Generate natural language response
+        answer = self._generate_natural_response(query, df, sql_query)
+        
+        # Add SQL query to response (for transparency)
+        answer += f"\n\n<details>\n<summary>SQL Query Used</summary>\n\n```sql\n{sql_query}\n```\n</details>"
+        
+        return {
+            "answer": answer,
+            "dataframe": df,
+            "sql_query": sql_query
+        }
+    
+    @staticmethod
+    def _error_result(e: Exception) -> Dict[str, Any]:
+        """Build the response for a query that failed"""
+        return {
+            "answer": f"I encountered an error processing your query: {str(e)}\n\nPlease try rephrasing your question or check the Snowflake connection.",
+            "dataframe": None,
+            "error": str(e)
+        }
@@ -3,12 +3,50 @@ RAG (Retrieval Augmented Generation) engine for document retrieval
 """
 
 import os
+import hashlib
+from pathlib import Path
 from typing import List, Dict
+import numpy as np
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+try:
+    import streamlit as st
+    _cache_resource = st.cache_resource
+except ImportError:  # Used outside the Streamlit app
+    from functools import lru_cache
+    _cache_resource = lru_cache(maxsize=None)
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Embeddings of the built-in knowledge base are cached here between boots
+EMBEDDING_CACHE_DIR = Path.home() / ".cache" / "scap"
+
+
+def _auto_device() -> str:
+    """Pick the fastest available torch device for the embedding model"""
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+@_cache_resource
+def _get_embeddings(model_name: str) -> HuggingFaceEmbeddings:
+    """Load the embedding model once per process and share it across sessions"""
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': _auto_device()},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
 
 class RAGEngine:
     """Handle document embedding, storage, and retrieval"""
@@ -19,13 +57,13 @@ class RAGEngine:
         
         # Use HuggingFace embeddings (FREE, no API key needed!)
         # This model is small, fast, and good quality
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        self.embeddings = _get_embeddings(EMBEDDING_MODEL)
+        
+        # Brute-force index: the corpus is tiny, so a dense matrix of
+        # normalized embeddings beats an ANN index on both init and search
+        self._docs: List[Document] = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
         
-        self.vector_store = None
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200
@@ -171,24 +209,56 @@ class RAGEngine:
         # Split documents into chunks
         splits = self.text_splitter.split_documents(documents)
         
-        # Create vector store
-        self.vector_store = FAISS.from_documents(splits, self.embeddings)
+        # Reuse embeddings from a previous boot if the text and model are unchanged
+        key = hashlib.sha256(
+            (EMBEDDING_MODEL + "||" + "\n\n".join(d.page_content for d in splits)).encode()
+        ).hexdigest()[:16]
+        cache_path = EMBEDDING_CACHE_DIR / f"rag_{key}.npy"
+        
+        if cache_path.exists():
+            # Memory-mapped read-only; add_documents stacks into a new array
+            self._matrix = np.load(cache_path, mmap_mode='r')
+            self._docs = list(splits)
+            return
+        
+        self._index_splits(splits)
+        
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(cache_path, self._matrix)
+        except OSError:
+            pass  # Caching is best-effort
     
     def add_documents(self, documents: List[Document]) -> None:
         """Add new documents to the vector store"""
-        splits = self.text_splitter.split_documents(documents)
-        if self.vector_store:
-            self.vector_store.add_documents(splits)
-        else:
-            self.vector_store = FAISS.from_documents(splits, self.embeddings)
+        self._index_splits(self.text_splitter.split_documents(documents))
+    
+    def _index_splits(self, splits: List[Document]) -> None:
+        """Embed document chunks in one batch and append them to the index"""
+        if not splits:
+            return
+        
+        vectors = np.asarray(
+            self.embeddings.embed_documents([d.page_content for d in splits]),
+            dtype=np.float32
+        )
+        self._matrix = np.vstack([self._matrix, vectors]) if self._docs else vectors
+        self._docs.extend(splits)
     
     def retrieve_context(self, query: str, k: int = 3) -> List[Document]:
         """Retrieve relevant documents for a query"""
-        if not self.vector_store:
+        if not self._docs:
             return []
         
-        results = self.vector_store.similarity_search(query, k=k)
-        return results
+        # Embeddings are L2-normalized, so the dot product is the cosine similarity
+        q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        scores = self._matrix @ q
+        
+        k = min(k, len(self._docs))
+        idx = np.argpartition(scores, -k)[-k:]
+        idx = idx[np.argsort(-scores[idx])]
+        
+        return [self._docs[i] for i in idx]
     
     def get_relevant_context(self, query: str) -> str:
         """Get relevant context as a formatted string"""
@@ -2,9 +2,41 @@
 Snowflake connector for executing queries and retrieving data
 """
 
+import json
+import time
+import threading
+from functools import lru_cache
+from pathlib import Path
 import snowflake.connector
 import pandas as pd
-from typing import Optional, Dict, Any
+from snowflake.connector.errors import NotSupportedError
+from typing import Optional, Dict, Any, Iterator, Sequence
+
+# Schema metadata is cached on disk so reconnects skip INFORMATION_SCHEMA
+SCHEMA_CACHE_DIR = Path.home() / ".cache" / "scap"
+SCHEMA_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Seconds between status checks while waiting on an async query
+ASYNC_POLL_INTERVAL = 0.1
+
+SCHEMA_COLUMNS_QUERY = """
+SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE
+FROM IDENTIFIER(%s)
+WHERE TABLE_SCHEMA = %s
+ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+
+def _schema_cache_path(account: str, role: Optional[str], database: str, schema: str) -> Path:
+    """Location of the cached schema info for a database/schema as seen by an account and role"""
+    return SCHEMA_CACHE_DIR / f"schema_{account}_{role}_{database}_{schema}.json"
+
+
+@lru_cache(maxsize=32)
+def _read_schema_cache(path: Path, mtime: float) -> Dict[str, Any]:
+    """Read a schema cache file (memoized per file version)"""
+    with open(path, "r") as f:
+        return json.load(f)
 
 
 class SnowflakeConnector:
@@ -19,9 +51,17 @@ class SnowflakeConnector:
             "password": password,
             "database": database,
             "schema": schema,
-            "warehouse": warehouse
+            "warehouse": warehouse,
+            # Arrow results deserialize straight into pandas without Python tuples
+            "session_parameters": {"QUERY_RESULT_FORMAT": "ARROW"}
         }
         self.conn = None
+        # One cursor reused for every query; the lock keeps threads
+        # (e.g. the async warm-up path) from interleaving on it
+        self._cursor = None
+        self._cursor_lock = threading.Lock()
+        # Query id of a schema query submitted by prefetch_schema_info
+        self._schema_qid: Optional[str] = None
         self.connect()
     
     def connect(self) -> None:
@@ -31,52 +71,122 @@ class SnowflakeConnector:
         except Exception as e:
             raise Exception(f"Failed to connect to Snowflake: {str(e)}")
     
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute SQL query and return results as DataFrame"""
+    def execute_query(self, query: str, params: Optional[Sequence[Any]] = None,
+                      arrow_dtypes: bool = True) -> pd.DataFrame:
+        """Execute SQL query and return results as DataFrame
+        
+        With arrow_dtypes the columns keep their Arrow buffers (pd.ArrowDtype),
+        so Streamlit can send them to the browser without re-converting.
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query)
-            
-            # Fetch results
+            with self._cursor_lock:
+                cursor = self._get_cursor()
+                cursor.execute(query, params)
+                return self._fetch_dataframe(cursor, arrow_dtypes)
+        except Exception as e:
+            raise Exception(f"Query execution failed: {str(e)}")
+    
+    def _get_cursor(self):
+        """Return the shared cursor, opening it on first use"""
+        if self._cursor is None:
+            self._cursor = self.conn.cursor()
+        return self._cursor
+    
+    @staticmethod
+    def _fetch_dataframe(cursor, arrow_dtypes: bool) -> pd.DataFrame:
+        """Fetch the pending result of a cursor as a DataFrame"""
+        try:
+            if arrow_dtypes:
+                return cursor.fetch_pandas_all(types_mapper=pd.ArrowDtype)
+            return cursor.fetch_pandas_all()
+        except NotSupportedError:
+            # Non-Arrow results (SHOW/DESCRIBE, metadata queries)
             results = cursor.fetchall()
             columns = [desc[0] for desc in cursor.description]
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(results, columns=columns)
+            return pd.DataFrame(results, columns=columns)
+    
+    def execute_query_batches(self, query: str) -> Iterator[pd.DataFrame]:
+        """Execute SQL query and yield results as a stream of DataFrames"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(query)
+            yield from cursor.fetch_pandas_batches()
             cursor.close()
-            
-            return df
         except Exception as e:
             raise Exception(f"Query execution failed: {str(e)}")
     
-    def get_schema_info(self) -> Dict[str, Any]:
+    def _submit_schema_query(self) -> str:
+        """Start the schema metadata query without waiting for it"""
+        database = self.connection_params['database']
+        schema = self.connection_params['schema']
+        with self._cursor_lock:
+            cursor = self._get_cursor()
+            cursor.execute_async(
+                SCHEMA_COLUMNS_QUERY, (f"{database}.INFORMATION_SCHEMA.COLUMNS", schema)
+            )
+            return cursor.sfqid
+    
+    def _schema_cache_file(self) -> Path:
+        """Schema cache location for this connection's account, role, database and schema"""
+        return _schema_cache_path(self.connection_params['account'], self.conn.role,
+                                  self.connection_params['database'],
+                                  self.connection_params['schema'])
+    
+    def _schema_cache_fresh(self, cache_path: Path) -> bool:
+        """Whether the on-disk schema cache exists and is within its TTL"""
+        return cache_path.exists() and time.time() - cache_path.stat().st_mtime < SCHEMA_CACHE_TTL
+    
+    def prefetch_schema_info(self) -> None:
+        """Submit the schema query in the background so get_schema_info only collects it
+        
+        Lets callers overlap the INFORMATION_SCHEMA scan with their own
+        start-up work. Does nothing when the schema cache is still fresh.
+        """
+        cache_path = self._schema_cache_file()
+        if self._schema_qid is None and not self._schema_cache_fresh(cache_path):
+            try:
+                self._schema_qid = self._submit_schema_query()
+            except Exception:
+                self._schema_qid = None  # get_schema_info will run it synchronously
+    
+    def get_schema_info(self, refresh: bool = False) -> Dict[str, Any]:
         """Get information about available tables and columns"""
+        cache_path = self._schema_cache_file()
+        
+        if not refresh and self._schema_cache_fresh(cache_path):
+            return _read_schema_cache(cache_path, cache_path.stat().st_mtime)
+        
         try:
-            # Get tables
-            tables_query = f"""
-            SELECT TABLE_NAME, TABLE_TYPE
-            FROM {self.connection_params['database']}.INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_SCHEMA = '{self.connection_params['schema']}'
-            ORDER BY TABLE_NAME
-            """
-            tables_df = self.execute_query(tables_query)
+            # Get all columns for all tables in a single round-trip, reusing
+            # a query already submitted by prefetch_schema_info
+            qid, self._schema_qid = self._schema_qid, None
+            if qid is None:
+                qid = self._submit_schema_query()
+            
+            # Poll without holding the cursor so other queries can run meanwhile
+            while self.conn.is_still_running(self.conn.get_query_status_throw_if_error(qid)):
+                time.sleep(ASYNC_POLL_INTERVAL)
             
-            # Get columns for each table
-            schema_info = {}
-            for table_name in tables_df['TABLE_NAME']:
-                columns_query = f"""
-                SELECT COLUMN_NAME, DATA_TYPE
-                FROM {self.connection_params['database']}.INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_SCHEMA = '{self.connection_params['schema']}'
-                AND TABLE_NAME = '{table_name}'
-                ORDER BY ORDINAL_POSITION
-                """
-                columns_df = self.execute_query(columns_query)
-                schema_info[table_name] = columns_df.to_dict('records')
+            with self._cursor_lock:
+                cursor = self._get_cursor()
+                cursor.get_results_from_sfqid(qid)
+                columns_df = self._fetch_dataframe(cursor, arrow_dtypes=False)
             
-            return schema_info
+            schema_info = {
+                table_name: group[['COLUMN_NAME', 'DATA_TYPE']].to_dict('records')
+                for table_name, group in columns_df.groupby('TABLE_NAME', sort=False)
+            }
         except Exception as e:
             raise Exception(f"Failed to retrieve schema info: {str(e)}")
+        
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, "w") as f:
+                json.dump(schema_info, f)
+        except OSError:
+            pass  # Caching is best-effort
+        
+        return schema_info
     
     def get_table_preview(self, table_name: str, limit: int = 5) -> pd.DataFrame:
         """Get preview of table data"""
@@ -85,5 +195,8 @@ class SnowflakeConnector:
     
     def close(self) -> None:
         """Close Snowflake connection"""
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
         if self.conn:
             self.conn.close()
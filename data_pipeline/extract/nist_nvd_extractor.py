@@ -11,12 +11,23 @@ Author: Deepthi Desharaju
 Date: February 2026
 """
 
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
-import json
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import ijson
+import re
 import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor
+import os
 import argparse
 import logging
 from pathlib import Path
@@ -28,6 +39,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Low-cardinality text, stored dictionary-encoded
+DICTIONARY_STRING = pa.dictionary(pa.int32(), pa.string())
+
+# Arrow schema of the records produced by parse_cves
+CVE_SCHEMA = pa.schema([
+    ('cve_id', pa.string()),
+    ('published_date', pa.string()),
+    ('modified_date', pa.string()),
+    ('vuln_status', DICTIONARY_STRING),
+    ('description', pa.large_string()),
+    ('cvss_v3_score', pa.float32()),
+    ('cvss_v3_severity', DICTIONARY_STRING),
+    ('attack_vector', DICTIONARY_STRING),
+    ('attack_complexity', DICTIONARY_STRING),
+    ('privileges_required', DICTIONARY_STRING),
+    ('user_interaction', DICTIONARY_STRING),
+    ('exploitability_score', pa.float32()),
+    ('impact_score', pa.float32()),
+    ('cwe_ids', pa.list_(pa.string())),
+    ('vendor', DICTIONARY_STRING),
+    ('product', DICTIONARY_STRING),
+    ('reference_count', pa.int32()),
+    ('extracted_at', pa.string()),
+])
+
+# CVE_SCHEMA with plain value types, as built from pandas before encoding
+CVE_PLAIN_SCHEMA = pa.schema([
+    field.with_type(pa.string()) if pa.types.is_dictionary(field.type) else field
+    for field in CVE_SCHEMA
+])
+
+# Vendor and product tokens of a CPE URI (cpe:2.3:part:vendor:product:...)
+CPE_VENDOR_PRODUCT_RE = re.compile(r'^[^:]*:[^:]*:[^:]*:(?P<vendor>[^:]*):(?P<product>[^:]*)')
+
+# Output column -> field of the first cvssMetricV31 entry (json_normalize path)
+CVSS_FIELDS = {
+    'cvss_v3_score': 'cvssData.baseScore',
+    'cvss_v3_severity': 'cvssData.baseSeverity',
+    'attack_vector': 'cvssData.attackVector',
+    'attack_complexity': 'cvssData.attackComplexity',
+    'privileges_required': 'cvssData.privilegesRequired',
+    'user_interaction': 'cvssData.userInteraction',
+    'exploitability_score': 'exploitabilityScore',
+    'impact_score': 'impactScore',
+}
+
 
 class NISTNVDExtractor:
     """
@@ -37,6 +94,12 @@ class NISTNVDExtractor:
     BASE_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
     RESULTS_PER_PAGE = 2000  # API max
     RATE_LIMIT_DELAY = 6  # seconds between requests (public API rate limit)
+    MAX_CONCURRENT_REQUESTS = 5  # pages in flight at once
+    MAX_RETRIES = 5  # extra attempts per page before the run fails
+    RETRY_BACKOFF = 2.0  # seconds before the first retry, doubled per attempt
+    RETRY_STATUSES = (403, 429, 500, 502, 503, 504)  # NVD answers rate limiting with 403
+    PARSE_CHUNK_SIZE = 250  # raw records buffered per vectorized parse
+    PARSE_WORKERS = os.cpu_count()  # processes parsing CVE batches
     
     def __init__(self, api_key: Optional[str] = None):
         """
@@ -47,9 +110,25 @@ class NISTNVDExtractor:
         """
         self.api_key = api_key
         self.session = requests.Session()
+        
+        # Pooled keep-alive connections; retries absorb 429s and transient 5xx
+        retry = Retry(
+            total=5,
+            backoff_factor=1.0,
+            status_forcelist=(403, 429, 500, 502, 503, 504),  # NVD rate-limits with 403
+            allowed_methods=('GET',)
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Connection': 'keep-alive',
+            'Accept-Encoding': 'gzip, deflate'
+        })
+        
         if api_key:
             self.session.headers.update({'apiKey': api_key})
             self.RATE_LIMIT_DELAY = 0.6  # With API key, rate limit is higher
+            self.MAX_CONCURRENT_REQUESTS = 20
     
     def extract_cve_data(
         self, 
@@ -68,190 +147,330 @@ class NISTNVDExtractor:
         Returns:
             DataFrame containing CVE records
         """
+        with ProcessPoolExecutor(max_workers=self.PARSE_WORKERS) as executor:
+            return asyncio.run(
+                self._extract_async(start_date, end_date, output_dir, executor)
+            )
+    
+    async def _extract_async(
+        self,
+        start_date: str,
+        end_date: str,
+        output_dir: str,
+        executor: Executor
+    ) -> pd.DataFrame:
+        """
+        Fetch all result pages concurrently and parse them.
+        
+        A one-record probe learns totalResults, so every page (including the
+        first) is scheduled upfront and requested in parallel. Response bodies are
+        parsed incrementally with ijson, so at most PARSE_CHUNK_SIZE raw CVE
+        records are held per batch; batches are parsed in the executor's
+        worker processes while downloads continue, and each parsed page is
+        appended to a Parquet file as soon as it arrives.
+        """
         logger.info(f"Extracting CVEs from {start_date} to {end_date}")
         
-        all_cves = []
-        start_index = 0
-        total_results = None
+        base_params = {
+            'pubStartDate': f"{start_date}T00:00:00.000",
+            'pubEndDate': f"{end_date}T23:59:59.999",
+            'resultsPerPage': self.RESULTS_PER_PAGE
+        }
         
-        while True:
-            # Build API request URL
-            params = {
-                'pubStartDate': f"{start_date}T00:00:00.000",
-                'pubEndDate': f"{end_date}T23:59:59.999",
-                'resultsPerPage': self.RESULTS_PER_PAGE,
-                'startIndex': start_index
-            }
-            
-            try:
-                logger.info(f"Fetching records {start_index} to {start_index + self.RESULTS_PER_PAGE}")
-                response = self.session.get(self.BASE_URL, params=params, timeout=30)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Get total results on first request
-                if total_results is None:
-                    total_results = data.get('totalResults', 0)
-                    logger.info(f"Total CVEs to fetch: {total_results}")
-                
-                # Extract vulnerabilities from response
-                vulnerabilities = data.get('vulnerabilities', [])
-                
-                if not vulnerabilities:
-                    logger.info("No more results. Extraction complete.")
-                    break
-                
-                # Parse each CVE
-                for vuln in vulnerabilities:
-                    cve_data = self._parse_cve(vuln)
-                    all_cves.append(cve_data)
-                
-                # Move to next page
-                start_index += len(vulnerabilities)
-                
-                # Check if we've fetched all results
-                if start_index >= total_results:
-                    logger.info("All CVEs extracted successfully.")
-                    break
-                
-                # Rate limiting
-                time.sleep(self.RATE_LIMIT_DELAY)
+        # The probe counts against the rate limit like any page request
+        probe_release_at = time.monotonic() + self.RATE_LIMIT_DELAY * self.MAX_CONCURRENT_REQUESTS
+        total_results = self._probe_total_results(base_params)
+        logger.info(f"Total CVEs to fetch: {total_results}")
+        
+        parquet_path = self._output_file(output_dir, start_date, end_date, 'parquet')
+        with pq.ParquetWriter(parquet_path, CVE_SCHEMA, compression='zstd') as writer:
+            offsets = range(0, total_results, self.RESULTS_PER_PAGE)
+            if offsets:
+                sem = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+                # Hold one slot for the probe, so the first wave has one page fewer
+                await sem.acquire()
+                asyncio.get_running_loop().call_later(
+                    max(0.0, probe_release_at - time.monotonic()), sem.release
+                )
+                connector = aiohttp.TCPConnector(limit_per_host=self.MAX_CONCURRENT_REQUESTS)
+                headers = {'apiKey': self.api_key} if self.api_key else None
                 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"API request failed: {e}")
-                break
+                async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+                    tasks = [
+                        self._fetch_page(session, base_params, start_index, sem, executor)
+                        for start_index in offsets
+                    ]
+                    # Write pages in completion order; row order is not significant
+                    for page in asyncio.as_completed(tasks):
+                        writer.write_table(await page)
+        
+        logger.info("All CVEs extracted successfully.")
+        logger.info(f"Data saved to {parquet_path}")
         
-        # Convert to DataFrame
-        df = pd.DataFrame(all_cves)
+        # Load back with Arrow-backed columns (no per-value Python objects);
+        # dictionary columns become pandas categoricals
+        table = pq.read_table(parquet_path)
+        df = table.to_pandas(
+            types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t)
+        )
         logger.info(f"Extracted {len(df)} CVE records")
         
         # Save to CSV
-        self._save_to_csv(df, output_dir, start_date, end_date)
+        self._save_to_csv(table, output_dir, start_date, end_date)
         
         return df
     
-    def _parse_cve(self, vuln_data: Dict) -> Dict:
+    async def _fetch_page(
+        self,
+        session: aiohttp.ClientSession,
+        base_params: Dict,
+        start_index: int,
+        sem: asyncio.Semaphore,
+        executor: Executor
+    ) -> pa.Table:
         """
-        Parse a single CVE vulnerability record.
+        Fetch and parse one page of vulnerabilities, retrying failures.
+        
+        Rate-limit (403/429) and 5xx responses, timeouts, connection errors
+        and truncated bodies are retried up to MAX_RETRIES times with
+        exponential backoff, waiting for Retry-After when the server sends
+        one. A page that still fails raises, so a run never completes with
+        pages missing.
         
         Args:
-            vuln_data: Raw CVE data from API
+            session: Shared aiohttp session
+            base_params: Query parameters common to all pages
+            start_index: Index of the first record of the page
+            sem: Semaphore bounding the requests in flight
+            executor: Process pool parsing the page's batches
             
         Returns:
-            Parsed CVE dictionary
+            Table of the page's CVEs
         """
-        cve = vuln_data.get('cve', {})
-        cve_id = cve.get('id', '')
-        
-        # Basic metadata
-        published = cve.get('published', '')
-        modified = cve.get('lastModified', '')
-        vuln_status = cve.get('vulnStatus', '')
-        
-        # Description (take first English description)
-        descriptions = cve.get('descriptions', [])
-        description = next(
-            (d['value'] for d in descriptions if d.get('lang') == 'en'),
-            ''
-        )
-        
-        # CVSS v3.1 metrics (primary scoring system)
-        metrics = cve.get('metrics', {})
-        cvss_v3 = metrics.get('cvssMetricV31', [])
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                return await self._fetch_page_once(session, base_params, start_index, sem, executor)
+            except aiohttp.ClientResponseError as e:
+                if e.status not in self.RETRY_STATUSES or attempt == self.MAX_RETRIES:
+                    logger.error(f"API request for records from {start_index} failed: {e}")
+                    raise
+                delay = self._retry_delay(attempt, e.headers)
+                logger.warning(f"API request failed: {e}; retrying in {delay:.0f}s")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ijson.JSONError) as e:
+                if attempt == self.MAX_RETRIES:
+                    logger.error(f"API request for records from {start_index} failed: {e!r}")
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"API request failed: {e!r}; retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+    
+    def _retry_delay(self, attempt: int, headers=None) -> float:
+        """Seconds to wait before a retry: Retry-After if given, else backoff."""
+        retry_after = (headers or {}).get('Retry-After', '')
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.RETRY_BACKOFF * 2 ** attempt
+    
+    async def _fetch_page_once(
+        self,
+        session: aiohttp.ClientSession,
+        base_params: Dict,
+        start_index: int,
+        sem: asyncio.Semaphore,
+        executor: Executor
+    ) -> pa.Table:
+        """
+        Make one attempt at fetching and parsing a page.
         
-        cvss_score = None
-        cvss_severity = None
-        attack_vector = None
-        attack_complexity = None
-        privileges_required = None
-        user_interaction = None
-        exploitability_score = None
-        impact_score = None
+        Each semaphore slot is held for RATE_LIMIT_DELAY x MAX_CONCURRENT_REQUESTS
+        seconds from the request start, which keeps the average request rate
+        at one per RATE_LIMIT_DELAY while allowing pages to overlap.
         
-        if cvss_v3:
-            cvss_data = cvss_v3[0].get('cvssData', {})
-            cvss_score = cvss_data.get('baseScore')
-            cvss_severity = cvss_data.get('baseSeverity')
-            attack_vector = cvss_data.get('attackVector')
-            attack_complexity = cvss_data.get('attackComplexity')
-            privileges_required = cvss_data.get('privilegesRequired')
-            user_interaction = cvss_data.get('userInteraction')
+        Args:
+            session: Shared aiohttp session
+            base_params: Query parameters common to all pages
+            start_index: Index of the first record of the page
+            sem: Semaphore bounding the requests in flight
+            executor: Process pool parsing the page's batches
             
-            exploitability_score = cvss_v3[0].get('exploitabilityScore')
-            impact_score = cvss_v3[0].get('impactScore')
-        
-        # CWE (Common Weakness Enumeration)
-        weaknesses = cve.get('weaknesses', [])
-        cwe_ids = []
-        for weakness in weaknesses:
-            descriptions = weakness.get('description', [])
-            for desc in descriptions:
-                if desc.get('lang') == 'en':
-                    cwe_ids.append(desc.get('value', ''))
-        cwe_id = ', '.join(cwe_ids) if cwe_ids else None
-        
-        # References
-        references = cve.get('references', [])
-        reference_count = len(references)
-        
-        # Extract vendor and product info
-        configurations = cve.get('configurations', [])
-        products = []
-        vendors = []
-        
-        for config in configurations:
-            nodes = config.get('nodes', [])
-            for node in nodes:
-                cpe_matches = node.get('cpeMatch', [])
-                for cpe in cpe_matches:
-                    cpe_uri = cpe.get('criteria', '')
-                    # CPE format: cpe:2.3:a:vendor:product:version...
-                    parts = cpe_uri.split(':')
-                    if len(parts) >= 5:
-                        vendors.append(parts[3])
-                        products.append(parts[4])
-        
-        vendor = vendors[0] if vendors else None
-        product = ', '.join(set(products[:3])) if products else None  # Top 3 unique products
+        Returns:
+            Table of the page's CVEs
+        """
+        async with sem:
+            release_at = time.monotonic() + self.RATE_LIMIT_DELAY * self.MAX_CONCURRENT_REQUESTS
+            try:
+                logger.info(f"Fetching records {start_index} to {start_index + self.RESULTS_PER_PAGE}")
+                async with session.get(
+                    self.BASE_URL,
+                    params={**base_params, 'startIndex': start_index},
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as resp:
+                    resp.raise_for_status()
+                    loop = asyncio.get_running_loop()
+                    extracted_at = datetime.now().isoformat()
+                    parsing = []
+                    chunk = []
+                    async for vuln in ijson.items(
+                        resp.content, 'vulnerabilities.item', use_float=True
+                    ):
+                        chunk.append(vuln)
+                        if len(chunk) == self.PARSE_CHUNK_SIZE:
+                            parsing.append(
+                                loop.run_in_executor(executor, parse_cves, chunk, extracted_at)
+                            )
+                            chunk = []
+                    parsing.append(loop.run_in_executor(executor, parse_cves, chunk, extracted_at))
+                return pa.concat_tables(await asyncio.gather(*parsing))
+            finally:
+                # Rate limiting
+                await asyncio.sleep(max(0.0, release_at - time.monotonic()))
+    
+    def _probe_total_results(self, base_params: Dict) -> int:
+        """
+        Learn the number of matching CVEs with a one-record request.
         
-        return {
-            'cve_id': cve_id,
-            'published_date': published,
-            'modified_date': modified,
-            'vuln_status': vuln_status,
-            'description': description[:500] if description else None,  # Truncate long descriptions
-            'cvss_v3_score': cvss_score,
-            'cvss_v3_severity': cvss_severity,
-            'attack_vector': attack_vector,
-            'attack_complexity': attack_complexity,
-            'privileges_required': privileges_required,
-            'user_interaction': user_interaction,
-            'exploitability_score': exploitability_score,
-            'impact_score': impact_score,
-            'cwe_id': cwe_id,
-            'vendor': vendor,
-            'product': product,
-            'reference_count': reference_count,
-            'extracted_at': datetime.now().isoformat()
-        }
+        Args:
+            base_params: Query parameters common to all pages
+            
+        Returns:
+            totalResults reported by the API
+        """
+        try:
+            response = self.session.get(
+                self.BASE_URL,
+                params={**base_params, 'resultsPerPage': 1, 'startIndex': 0},
+                timeout=30
+            )
+            response.raise_for_status()
+            return int(response.json()['totalResults'])
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            logger.error(f"API request failed: {e}")
+            raise
     
     def _save_to_csv(
         self, 
-        df: pd.DataFrame, 
+        table: pa.Table, 
         output_dir: str,
         start_date: str,
         end_date: str
     ):
-        """Save DataFrame to CSV file."""
+        """
+        Save CVE records to CSV file with Arrow's multi-threaded writer.
+        
+        The CSV keeps the flat LANDING.CVE_RAW layout: dictionary columns
+        are decoded and the cwe_ids list is joined into a cwe_id string.
+        """
+        filepath = self._output_file(output_dir, start_date, end_date, 'csv')
+        
+        cwe_index = table.schema.get_field_index('cwe_ids')
+        table = table.set_column(
+            cwe_index, 'cwe_id', pc.binary_join(table.column(cwe_index), ', ')
+        )
+        table = table.cast(pa.schema([
+            field.with_type(pa.string()) if pa.types.is_dictionary(field.type) else field
+            for field in table.schema
+        ]))
+        
+        pacsv.write_csv(table, filepath)
+        logger.info(f"Data saved to {filepath}")
+    
+    def _output_file(
+        self,
+        output_dir: str,
+        start_date: str,
+        end_date: str,
+        extension: str
+    ) -> Path:
+        """Path of an output file for a date range, creating its directory."""
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        filename = f"cve_data_{start_date}_to_{end_date}.csv"
-        filepath = output_path / filename
+        return output_path / f"cve_data_{start_date}_to_{end_date}.{extension}"
+
+
+def parse_cves(vulnerabilities: List[Dict], extracted_at: str) -> pa.Table:
+    """
+    Parse a batch of CVE vulnerability records in one vectorized pass.
+    
+    The raw records are flattened with pd.json_normalize and the nested
+    descriptions, CVSS metrics, weaknesses and CPE matches are derived
+    with column operations instead of per-record Python loops. Defined at
+    module level so batches can be parsed in worker processes.
+    
+    Args:
+        vulnerabilities: Raw CVE data from API
+        extracted_at: Extraction timestamp shared by the whole page
         
-        df.to_csv(filepath, index=False)
-        logger.info(f"Data saved to {filepath}")
+    Returns:
+        Table matching CVE_SCHEMA
+    """
+    if not vulnerabilities:
+        return CVE_SCHEMA.empty_table()
+    
+    df = pd.json_normalize(vulnerabilities, max_level=2)
+    
+    # Nested values stay object dtype so .str works even when a batch is all NaN
+    def col(name: str) -> pd.Series:
+        if name not in df:
+            return pd.Series(None, index=df.index, dtype=object)
+        return df[name].astype(object)
+    
+    def explode(series: pd.Series) -> pd.Series:
+        return series.explode().astype(object)
+    
+    parsed = pd.DataFrame(index=df.index)
+    
+    # Basic metadata
+    parsed['cve_id'] = col('cve.id').fillna('')
+    parsed['published_date'] = col('cve.published').fillna('')
+    parsed['modified_date'] = col('cve.lastModified').fillna('')
+    parsed['vuln_status'] = col('cve.vulnStatus').fillna('')
+    
+    # Description (take first English description)
+    # Fast path: the English description is almost always listed first
+    descriptions = col('cve.descriptions')
+    first = descriptions.str[0].astype(object)
+    first_is_english = first.str.get('lang') == 'en'
+    other = explode(descriptions[~first_is_english]).dropna()
+    description = pd.concat([
+        first[first_is_english].str.get('value'),
+        other[other.str.get('lang') == 'en'].str.get('value').groupby(level=0).first()
+    ])
+    parsed['description'] = description[description != '']
+    
+    # CVSS v3.1 metrics (primary scoring system)
+    cvss_v3 = col('cve.metrics.cvssMetricV31').str[0].dropna()
+    cvss = pd.json_normalize(cvss_v3.tolist()).set_axis(cvss_v3.index)
+    for name, field in CVSS_FIELDS.items():
+        parsed[name] = cvss[field] if field in cvss else None
+    
+    # CWE (Common Weakness Enumeration)
+    weakness_desc = explode(explode(col('cve.weaknesses')).str.get('description')).dropna()
+    english = weakness_desc[weakness_desc.str.get('lang') == 'en']
+    parsed['cwe_ids'] = english.str.get('value').fillna('').groupby(level=0).agg(list)
+    
+    # References
+    parsed['reference_count'] = col('cve.references').str.len().fillna(0).astype('int32')
+    
+    # Extract vendor and product info
+    # CPE format: cpe:2.3:a:vendor:product:version...
+    nodes = explode(explode(col('cve.configurations')).str.get('nodes'))
+    criteria = explode(nodes.str.get('cpeMatch')).str.get('criteria').fillna('')
+    cpe = criteria.str.extract(CPE_VENDOR_PRODUCT_RE).dropna()
+    parsed['vendor'] = cpe['vendor'].groupby(level=0).first()
+    top_products = cpe['product'].groupby(level=0).head(3)  # Top 3 unique products
+    parsed['product'] = (
+        top_products.reset_index().drop_duplicates()
+        .groupby('index')['product'].agg(', '.join)
+    )
+    
+    parsed['extracted_at'] = extracted_at
+    
+    table = pa.Table.from_pandas(parsed, schema=CVE_PLAIN_SCHEMA, preserve_index=False)
+    for i, field in enumerate(CVE_SCHEMA):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field, pc.dictionary_encode(table.column(i)))
+    return table
 
 
 def main():
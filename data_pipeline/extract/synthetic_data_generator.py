@@ -11,9 +11,13 @@ Date: February 2026
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
+from typing import Dict, Iterator
 from faker import Faker
-import random
 import argparse
 import logging
 from pathlib import Path
@@ -25,11 +29,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Faker
-fake = Faker()
-Faker.seed(42)
-np.random.seed(42)
-random.seed(42)
+
+def write_csv(df: pd.DataFrame, path: Path):
+    """Write a DataFrame to CSV with Arrow's multi-threaded writer."""
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), path)
 
 
 class SupplyChainDataGenerator:
@@ -68,89 +71,134 @@ class SupplyChainDataGenerator:
         self.num_stores = num_stores
         self.num_vendors = num_vendors
         
+        # Per-instance random sources: no shared module-level PRNG state
+        self.rng = np.random.default_rng(42)
+        self.fake = Faker()
+        self.fake.seed_instance(42)
+        
         # Master data
         self.products = None
         self.stores = None
         self.vendors = None
         self.customers = None
         
+        # Record-array copies of the master data for positional lookups
+        self._products_arr = None
+        self._stores_arr = None
+        
+    # Pricing based on category: (min, max) unit cost
+    UNIT_COST_RANGES = {
+        'Electronics': (50, 800),
+        'Clothing': (10, 150),
+        'Home & Kitchen': (20, 500)
+    }
+    DEFAULT_UNIT_COST_RANGE = (5, 100)
+    
+    VENDOR_COUNTRIES = ['USA', 'China', 'Germany', 'Japan', 'Mexico']
+    
+    # Narrowest dtypes that hold each generated column
+    PRODUCT_DTYPES = {'product_id': 'int32', 'unit_cost': 'float32', 'unit_price': 'float32'}
+    STORE_DTYPES = {'store_id': 'int16'}
+    VENDOR_DTYPES = {
+        'vendor_id': 'int16', 'avg_lead_time_days': 'int8', 'reliability_score': 'float32'
+    }
+    SALES_DTYPES = {
+        'transaction_id': 'int32', 'product_id': 'int32', 'store_id': 'int16',
+        'quantity_sold': 'int8', 'unit_price': 'float32', 'discount_amount': 'float32',
+        'total_revenue': 'float32', 'cost_of_goods': 'float32', 'profit': 'float32'
+    }
+    INVENTORY_DTYPES = {
+        'product_id': 'int32', 'store_id': 'int16', 'units_on_hand': 'int16',
+        'units_on_order': 'int16', 'reorder_point': 'int16', 'safety_stock': 'int16',
+        'days_of_supply': 'float32'
+    }
+    
+    def _faker_pool(self, provider, size: int) -> np.ndarray:
+        """Pre-draw a pool of Faker values to sample from in bulk."""
+        return np.array([provider() for _ in range(size)], dtype=object)
+    
     def generate_products(self) -> pd.DataFrame:
         """Generate product master data."""
         logger.info(f"Generating {self.num_products} products...")
         
-        products = []
-        for i in range(self.num_products):
-            category = random.choice(list(self.CATEGORIES.keys()))
-            subcategory = random.choice(self.CATEGORIES[category])
-            brand = random.choice(self.BRANDS)
-            
-            # Generate SKU
-            sku = f"{category[:3].upper()}{subcategory[:3].upper()}{i:04d}"
-            
-            # Pricing based on category
-            if category == 'Electronics':
-                unit_cost = round(random.uniform(50, 800), 2)
-            elif category == 'Clothing':
-                unit_cost = round(random.uniform(10, 150), 2)
-            elif category == 'Home & Kitchen':
-                unit_cost = round(random.uniform(20, 500), 2)
-            else:
-                unit_cost = round(random.uniform(5, 100), 2)
-            
-            unit_price = round(unit_cost * random.uniform(1.3, 2.5), 2)  # Markup
-            
-            products.append({
-                'product_id': i + 1,
-                'sku': sku,
-                'product_name': f"{brand} {subcategory} {fake.color_name()}",
-                'category': category,
-                'subcategory': subcategory,
-                'brand': brand,
-                'unit_cost': unit_cost,
-                'unit_price': unit_price,
-                'supplier': f"Vendor {random.randint(1, self.num_vendors)}"
-            })
-        
-        self.products = pd.DataFrame(products)
+        n = self.num_products
+        rng = self.rng
+        categories = np.array(list(self.CATEGORIES.keys()), dtype=object)
+        subcategories = np.array(list(self.CATEGORIES.values()), dtype=object)
+        
+        category_idx = rng.integers(0, len(categories), n)
+        category = categories[category_idx]
+        subcategory = subcategories[category_idx, rng.integers(0, subcategories.shape[1], n)]
+        brand = rng.choice(np.array(self.BRANDS, dtype=object), size=n)
+        colors = rng.choice(self._faker_pool(self.fake.color_name, 256), size=n)
+        
+        # Generate SKU
+        sku = (
+            pd.Series(category).str[:3].str.upper()
+            + pd.Series(subcategory).str[:3].str.upper()
+            + pd.Series(np.arange(n)).astype(str).str.zfill(4)
+        )
+        
+        # Pricing based on category
+        cost_ranges = np.array([
+            self.UNIT_COST_RANGES.get(c, self.DEFAULT_UNIT_COST_RANGE) for c in categories
+        ])
+        low, high = cost_ranges[category_idx].T
+        unit_cost = rng.uniform(low, high).round(2)
+        unit_price = (unit_cost * rng.uniform(1.3, 2.5, n)).round(2)  # Markup
+        
+        self.products = pd.DataFrame({
+            'product_id': np.arange(1, n + 1),
+            'sku': sku,
+            'product_name': brand + ' ' + subcategory + ' ' + colors,
+            'category': category,
+            'subcategory': subcategory,
+            'brand': brand,
+            'unit_cost': unit_cost,
+            'unit_price': unit_price,
+            'supplier': 'Vendor ' + pd.Series(rng.integers(1, self.num_vendors + 1, n)).astype(str)
+        }).astype(self.PRODUCT_DTYPES)
+        self._products_arr = self.products.to_records(index=False)
         return self.products
     
     def generate_stores(self) -> pd.DataFrame:
         """Generate store master data."""
         logger.info(f"Generating {self.num_stores} stores...")
         
-        stores = []
-        for i in range(self.num_stores):
-            region = random.choice(self.US_REGIONS)
-            store_type = random.choice(self.STORE_TYPES)
-            
-            stores.append({
-                'store_id': i + 1,
-                'store_name': f"Store {i + 1:03d}",
-                'store_type': store_type,
-                'region': region,
-                'city': fake.city(),
-                'state': fake.state_abbr(),
-                'opened_date': fake.date_between(start_date='-5y', end_date='-1y')
-            })
-        
-        self.stores = pd.DataFrame(stores)
+        n = self.num_stores
+        rng = self.rng
+        store_number = np.arange(1, n + 1)
+        
+        # Opened between 5 years and 1 year ago
+        today = pd.Timestamp.today().normalize()
+        opened_days_ago = rng.integers(365, 5 * 365 + 1, n)
+        
+        self.stores = pd.DataFrame({
+            'store_id': store_number,
+            'store_name': 'Store ' + pd.Series(store_number).astype(str).str.zfill(3),
+            'store_type': rng.choice(np.array(self.STORE_TYPES, dtype=object), size=n),
+            'region': rng.choice(np.array(self.US_REGIONS, dtype=object), size=n),
+            'city': rng.choice(self._faker_pool(self.fake.city, 512), size=n),
+            'state': rng.choice(self._faker_pool(self.fake.state_abbr, 60), size=n),
+            'opened_date': (today - pd.to_timedelta(opened_days_ago, unit='D')).date
+        }).astype(self.STORE_DTYPES)
+        self._stores_arr = self.stores.to_records(index=False)
         return self.stores
     
     def generate_vendors(self) -> pd.DataFrame:
         """Generate vendor master data."""
         logger.info(f"Generating {self.num_vendors} vendors...")
         
-        vendors = []
-        for i in range(self.num_vendors):
-            vendors.append({
-                'vendor_id': i + 1,
-                'vendor_name': fake.company(),
-                'vendor_country': random.choice(['USA', 'China', 'Germany', 'Japan', 'Mexico']),
-                'avg_lead_time_days': random.randint(3, 30),
-                'reliability_score': round(random.uniform(70, 99), 1)
-            })
-        
-        self.vendors = pd.DataFrame(vendors)
+        n = self.num_vendors
+        rng = self.rng
+        
+        self.vendors = pd.DataFrame({
+            'vendor_id': np.arange(1, n + 1),
+            'vendor_name': rng.choice(self._faker_pool(self.fake.company, n * 4), size=n),
+            'vendor_country': rng.choice(np.array(self.VENDOR_COUNTRIES, dtype=object), size=n),
+            'avg_lead_time_days': rng.integers(3, 31, n),
+            'reliability_score': rng.uniform(70, 99, n).round(1)
+        }).astype(self.VENDOR_DTYPES)
         return self.vendors
     
     def generate_sales(self, start_date: str, end_date: str) -> pd.DataFrame:
@@ -164,67 +212,153 @@ class SupplyChainDataGenerator:
         Returns:
             DataFrame of sales transactions
         """
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        days = (end - start).days
+        sales = pd.concat(self.iter_sales_batches(start_date, end_date), ignore_index=True)
+        
+        logger.info(f"Generated {len(sales)} sales transactions")
+        return sales
+    
+    def iter_sales_batches(self, start_date: str, end_date: str) -> Iterator[pd.DataFrame]:
+        """
+        Generate sales transactions one calendar month at a time.
+        
+        Args:
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD)
+            
+        Yields:
+            DataFrame of one month's sales transactions
+        """
+        dates = pd.date_range(start_date, end_date, freq='D', inclusive='left')
+        days = len(dates)
         
         logger.info(f"Generating sales data for {days} days...")
         
-        sales = []
-        transaction_id = 1
+        rng = self.rng
+        # Format each day once; transactions index into these labels
+        date_labels = dates.strftime('%Y-%m-%d').to_numpy()
         
-        # Generate daily sales
-        for day in range(days):
-            current_date = start + timedelta(days=day)
-            
-            # More sales on weekends
-            is_weekend = current_date.weekday() >= 5
-            base_transactions = 200 if is_weekend else 150
-            
-            # Seasonal boost (Q4 holidays)
-            if current_date.month in [11, 12]:
-                base_transactions = int(base_transactions * 1.5)
+        # More sales on weekends
+        base_transactions = np.where(dates.weekday >= 5, 200, 150)
+        
+        # Seasonal boost (Q4 holidays)
+        base_transactions = np.where(
+            dates.month.isin([11, 12]), (base_transactions * 1.5).astype(int), base_transactions
+        )
+        
+        # Random variation
+        num_transactions = (base_transactions * rng.uniform(0.8, 1.2, days)).astype(int)
+        
+        months = dates.to_period('M')
+        first_transaction_id = 1
+        for month in months.unique():
+            in_month = months == month
+            batch = self._sales_batch(
+                date_labels[in_month], num_transactions[in_month], first_transaction_id
+            )
+            first_transaction_id += len(batch)
+            yield batch
+    
+    def _sales_batch(
+        self,
+        date_labels: np.ndarray,
+        num_transactions: np.ndarray,
+        first_transaction_id: int
+    ) -> pd.DataFrame:
+        """
+        Draw the sales transactions of a run of days in one vectorized pass.
+        
+        Args:
+            date_labels: Days of the batch (YYYY-MM-DD)
+            num_transactions: Number of transactions on each day
+            first_transaction_id: transaction_id of the batch's first row
             
-            # Random variation
-            num_transactions = int(base_transactions * random.uniform(0.8, 1.2))
+        Returns:
+            DataFrame of sales transactions
+        """
+        rng = self.rng
+        total = int(num_transactions.sum())
+        
+        # Draw every transaction at once
+        products = self._products_arr
+        stores = self._stores_arr
+        product_idx = rng.integers(0, len(products), total)
+        store_idx = rng.integers(0, len(stores), total)
+        
+        quantity = rng.choice([1, 2, 3, 4, 5], size=total, p=[0.50, 0.25, 0.15, 0.07, 0.03])
+        
+        # Discount probability
+        has_discount = rng.random(total) < 0.15  # 15% of sales have discount
+        discount_pct = np.where(has_discount, rng.uniform(0.05, 0.3, total), 0.0)
+        
+        # Money math in float64; downcast once the row is final
+        unit_price = products['unit_price'][product_idx].astype(np.float64)
+        unit_cost = products['unit_cost'][product_idx].astype(np.float64)
+        discount_amount = (unit_price * discount_pct * quantity).round(2)
+        total_revenue = (unit_price * quantity - discount_amount).round(2)
+        cost_of_goods = (unit_cost * quantity).round(2)
+        profit = (total_revenue - cost_of_goods).round(2)
+        
+        return pd.DataFrame({
+            'transaction_id': np.arange(first_transaction_id, first_transaction_id + total),
+            'sale_date': np.repeat(date_labels, num_transactions),
+            'product_id': products['product_id'][product_idx],
+            'store_id': stores['store_id'][store_idx],
+            'customer_segment': rng.choice(['Regular', 'Premium', 'VIP'], size=total),
+            'quantity_sold': quantity,
+            'unit_price': unit_price,
+            'discount_amount': discount_amount,
+            'total_revenue': total_revenue,
+            'cost_of_goods': cost_of_goods,
+            'profit': profit
+        }).astype(self.SALES_DTYPES)
+    
+    def save_sales(self, start_date: str, end_date: str, output_dir: str = "data/raw") -> Dict:
+        """
+        Generate sales month by month and stream them to disk.
+        
+        Each month is appended to sales.csv and written to a Parquet dataset
+        under sales/ partitioned by year_month, so only one month of
+        transactions is held in memory.
+        
+        Args:
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD)
+            output_dir: Directory to save the files
             
-            for _ in range(num_transactions):
-                product = self.products.sample(1).iloc[0]
-                store = self.stores.sample(1).iloc[0]
-                
-                quantity = random.choices(
-                    [1, 2, 3, 4, 5],
-                    weights=[50, 25, 15, 7, 3]
-                )[0]
-                
-                # Discount probability
-                has_discount = random.random() < 0.15  # 15% of sales have discount
-                discount_pct = random.uniform(0.05, 0.3) if has_discount else 0
-                
-                unit_price = product['unit_price']
-                discount_amount = round(unit_price * discount_pct * quantity, 2)
-                total_revenue = round(unit_price * quantity - discount_amount, 2)
-                cost_of_goods = round(product['unit_cost'] * quantity, 2)
-                profit = round(total_revenue - cost_of_goods, 2)
+        Returns:
+            Summary totals: transactions, total_revenue, total_profit
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        
+        summary = {'transactions': 0, 'total_revenue': 0.0, 'total_profit': 0.0}
+        schema = None
+        csv_writer = None
+        try:
+            for batch in self.iter_sales_batches(start_date, end_date):
+                table = pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+                if csv_writer is None:
+                    schema = table.schema
+                    csv_writer = pacsv.CSVWriter(output_path / 'sales.csv', schema)
+                csv_writer.write_table(table)
                 
-                sales.append({
-                    'transaction_id': transaction_id,
-                    'sale_date': current_date.strftime('%Y-%m-%d'),
-                    'product_id': product['product_id'],
-                    'store_id': store['store_id'],
-                    'customer_segment': random.choice(['Regular', 'Premium', 'VIP']),
-                    'quantity_sold': quantity,
-                    'unit_price': unit_price,
-                    'discount_amount': discount_amount,
-                    'total_revenue': total_revenue,
-                    'cost_of_goods': cost_of_goods,
-                    'profit': profit
-                })
+                year_month = pc.utf8_slice_codeunits(table['sale_date'], 0, 7)
+                pq.write_to_dataset(
+                    table.append_column('year_month', year_month),
+                    root_path=output_path / 'sales',
+                    partition_cols=['year_month'],
+                    existing_data_behavior='delete_matching'
+                )
                 
-                transaction_id += 1
+                summary['transactions'] += len(batch)
+                summary['total_revenue'] += batch['total_revenue'].to_numpy().sum(dtype=np.float64)
+                summary['total_profit'] += batch['profit'].to_numpy().sum(dtype=np.float64)
+        finally:
+            if csv_writer is not None:
+                csv_writer.close()
         
-        logger.info(f"Generated {len(sales)} sales transactions")
-        return pd.DataFrame(sales)
+        logger.info(f"Generated {summary['transactions']} sales transactions")
+        return summary
     
     def generate_inventory_snapshots(self, date: str) -> pd.DataFrame:
         """
@@ -238,50 +372,54 @@ class SupplyChainDataGenerator:
         """
         logger.info(f"Generating inventory snapshot for {date}...")
         
-        inventory = []
-        
-        for _, product in self.products.iterrows():
-            for _, store in self.stores.iterrows():
-                # Base inventory level depends on product category
-                if product['category'] == 'Electronics':
-                    base_units = random.randint(10, 100)
-                elif product['category'] == 'Clothing':
-                    base_units = random.randint(20, 200)
-                else:
-                    base_units = random.randint(15, 150)
-                
-                units_on_hand = max(0, int(base_units * random.uniform(0.5, 1.5)))
-                units_on_order = random.randint(0, 50) if units_on_hand < base_units * 0.3 else 0
-                
-                reorder_point = int(base_units * 0.2)
-                safety_stock = int(reorder_point * 0.5)
-                
-                # Calculate days of supply (assuming avg 5 units sold per day)
-                daily_demand = 5
-                days_of_supply = units_on_hand / daily_demand if daily_demand > 0 else 0
-                
-                inventory.append({
-                    'snapshot_date': date,
-                    'product_id': product['product_id'],
-                    'store_id': store['store_id'],
-                    'units_on_hand': units_on_hand,
-                    'units_on_order': units_on_order,
-                    'reorder_point': reorder_point,
-                    'safety_stock': safety_stock,
-                    'days_of_supply': round(days_of_supply, 1)
-                })
+        # Every product x store pair, product-major
+        products = self._products_arr
+        stores = self._stores_arr
+        n = len(products) * len(stores)
+        rng = self.rng
+        category = np.repeat(products['category'], len(stores))
+        
+        # Base inventory level depends on product category
+        base_units = np.select(
+            [category == 'Electronics', category == 'Clothing'],
+            [rng.integers(10, 101, n), rng.integers(20, 201, n)],
+            default=rng.integers(15, 151, n)
+        )
+        
+        units_on_hand = np.maximum(0, (base_units * rng.uniform(0.5, 1.5, n)).astype(int))
+        units_on_order = np.where(
+            units_on_hand < base_units * 0.3, rng.integers(0, 51, n), 0
+        )
+        
+        reorder_point = (base_units * 0.2).astype(int)
+        safety_stock = (reorder_point * 0.5).astype(int)
+        
+        # Calculate days of supply (assuming avg 5 units sold per day)
+        daily_demand = 5
+        days_of_supply = units_on_hand / daily_demand
+        
+        inventory = pd.DataFrame({
+            'snapshot_date': date,
+            'product_id': np.repeat(products['product_id'], len(stores)),
+            'store_id': np.tile(stores['store_id'], len(products)),
+            'units_on_hand': units_on_hand,
+            'units_on_order': units_on_order,
+            'reorder_point': reorder_point,
+            'safety_stock': safety_stock,
+            'days_of_supply': days_of_supply.round(1)
+        }).astype(self.INVENTORY_DTYPES)
         
         logger.info(f"Generated {len(inventory)} inventory records")
-        return pd.DataFrame(inventory)
+        return inventory
     
     def save_to_csv(self, output_dir: str = "data/raw"):
         """Save all generated data to CSV files."""
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        self.products.to_csv(output_path / 'products.csv', index=False)
-        self.stores.to_csv(output_path / 'stores.csv', index=False)
-        self.vendors.to_csv(output_path / 'vendors.csv', index=False)
+        write_csv(self.products, output_path / 'products.csv')
+        write_csv(self.stores, output_path / 'stores.csv')
+        write_csv(self.vendors, output_path / 'vendors.csv')
         
         logger.info(f"All data saved to {output_dir}")
 
@@ -334,10 +472,11 @@ def main():
     generator.generate_stores()
     generator.generate_vendors()
     
-    # Generate transactional data
-    sales_df = generator.generate_sales(
+    # Generate transactional data, streamed to disk month by month
+    sales_summary = generator.save_sales(
         start_date=start_date.strftime('%Y-%m-%d'),
-        end_date=end_date.strftime('%Y-%m-%d')
+        end_date=end_date.strftime('%Y-%m-%d'),
+        output_dir=args.output_dir
     )
     
     # Generate current inventory snapshot
@@ -349,22 +488,27 @@ def main():
     output_path = Path(args.output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    generator.products.to_csv(output_path / 'products.csv', index=False)
-    generator.stores.to_csv(output_path / 'stores.csv', index=False)
-    generator.vendors.to_csv(output_path / 'vendors.csv', index=False)
-    sales_df.to_csv(output_path / 'sales.csv', index=False)
-    inventory_df.to_csv(output_path / 'inventory_snapshot.csv', index=False)
+    write_csv(generator.products, output_path / 'products.csv')
+    write_csv(generator.stores, output_path / 'stores.csv')
+    write_csv(generator.vendors, output_path / 'vendors.csv')
+    write_csv(inventory_df, output_path / 'inventory_snapshot.csv')
+    pq.write_table(
+        pa.Table.from_pandas(inventory_df, preserve_index=False),
+        output_path / 'inventory_snapshot.parquet',
+        compression='zstd'
+    )
     
     # Summary statistics
     logger.info("\n=== Data Generation Summary ===")
     logger.info(f"Products: {len(generator.products)}")
     logger.info(f"Stores: {len(generator.stores)}")
     logger.info(f"Vendors: {len(generator.vendors)}")
-    logger.info(f"Sales Transactions: {len(sales_df)}")
+    logger.info(f"Sales Transactions: {sales_summary['transactions']}")
     logger.info(f"Inventory Records: {len(inventory_df)}")
-    logger.info(f"\nTotal Revenue: ${sales_df['total_revenue'].sum():,.2f}")
-    logger.info(f"Total Profit: ${sales_df['profit'].sum():,.2f}")
-    logger.info(f"Avg Transaction Value: ${sales_df['total_revenue'].mean():.2f}")
+    logger.info(f"\nTotal Revenue: ${sales_summary['total_revenue']:,.2f}")
+    logger.info(f"Total Profit: ${sales_summary['total_profit']:,.2f}")
+    avg_transaction_value = sales_summary['total_revenue'] / max(sales_summary['transactions'], 1)
+    logger.info(f"Avg Transaction Value: ${avg_transaction_value:.2f}")
     logger.info(f"\nFiles saved to: {output_path}")
 
 
@@ -10,11 +10,18 @@ Date: February 2026
 """
 
 import snowflake.connector
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import yaml
 import logging
 from pathlib import Path
 import argparse
+import copy
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 
 # Configure logging
 logging.basicConfig(
@@ -23,74 +30,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Numeric column types per landing CSV, so the parser skips type inference
+# for them and scores stay float32; dates are still detected by the parser
+CSV_COLUMN_TYPES = {
+    'products.csv': {
+        'product_id': pa.int32(), 'unit_cost': pa.float32(), 'unit_price': pa.float32()
+    },
+    'stores.csv': {'store_id': pa.int32()},
+    'vendors.csv': {
+        'vendor_id': pa.int32(), 'avg_lead_time_days': pa.int16(),
+        'reliability_score': pa.float32()
+    },
+    'sales.csv': {
+        'transaction_id': pa.int64(), 'product_id': pa.int32(), 'store_id': pa.int32(),
+        'quantity_sold': pa.int32(), 'unit_price': pa.float32(),
+        'discount_amount': pa.float32(), 'total_revenue': pa.float32(),
+        'cost_of_goods': pa.float32(), 'profit': pa.float32()
+    },
+    'inventory_snapshot.csv': {
+        'product_id': pa.int32(), 'store_id': pa.int32(), 'units_on_hand': pa.int32(),
+        'units_on_order': pa.int32(), 'reorder_point': pa.int32(),
+        'safety_stock': pa.int32(), 'days_of_supply': pa.float32()
+    },
+}
+
 
 class SupplyChainLoader:
     """
     Loads supply chain data into Snowflake.
     """
     
-    def __init__(self, config_path: str = "config/config.yaml"):
-        """Initialize Snowflake connection."""
-        self.config = self._load_config(config_path)
-        self.conn = None
-        self.cursor = None
+    LOAD_WORKERS = 5  # files loaded concurrently, one session each
+    WRITE_CHUNK_ROWS = 500_000  # rows per staged Parquet file
+    PUT_PARALLEL = 16  # upload threads per PUT
+    CSV_BLOCK_BYTES = 64 << 20  # bytes parsed per Arrow CSV block
     
-    def _load_config(self, config_path: str) -> dict:
-        """Load configuration from YAML file."""
-        config_file = Path(config_path)
-        if not config_file.exists():
-            raise FileNotFoundError(
-                f"Config file not found: {config_path}\n"
-                f"Copy config/config.template.yaml to config/config.yaml"
-            )
-        
-        with open(config_file, 'r') as f:
-            config = yaml.safe_load(f)
-        
-        return config['snowflake']
-    
-    def connect(self):
-        """Establish connection to Snowflake."""
-        try:
-            self.conn = snowflake.connector.connect(
-                user=self.config['user'],
-                password=self.config['password'],
-                account=self.config['account'],
-                warehouse=self.config['warehouse'],
-                database=self.config['database'],
-                schema=self.config['schema']
-            )
-            self.cursor = self.conn.cursor()
-            logger.info(f"✅ Connected to Snowflake account: {self.config['account']}")
-            logger.info(f"   Database: {self.config['database']}")
-        except Exception as e:
-            logger.error(f"❌ Failed to connect to Snowflake: {e}")
-            raise
-    
-    def disconnect(self):
-        """Close Snowflake connection."""
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
-        logger.info("Disconnected from Snowflake")
-    
-    def create_schemas_and_tables(self):
-        """Create database schemas and landing tables."""
-        logger.info("Setting up database schemas and tables...")
-        
-        # Create schemas
-        logger.info("Creating schemas...")
-        self.cursor.execute("CREATE SCHEMA IF NOT EXISTS LANDING")
-        self.cursor.execute("CREATE SCHEMA IF NOT EXISTS STAGING")
-        self.cursor.execute("CREATE SCHEMA IF NOT EXISTS MARTS")
-        logger.info("✅ Schemas created/verified: LANDING, STAGING, MARTS")
-        
-        # Create landing tables
-        logger.info("Creating landing tables...")
-        
-        # Products table
-        self.cursor.execute("""
+    # Schema and landing table DDL, executed as one batch
+    SETUP_DDL = [
+        "CREATE SCHEMA IF NOT EXISTS LANDING",
+        "CREATE SCHEMA IF NOT EXISTS STAGING",
+        "CREATE SCHEMA IF NOT EXISTS MARTS",
+        """
         CREATE TABLE IF NOT EXISTS LANDING.PRODUCTS (
             PRODUCT_ID INT PRIMARY KEY,
             SKU VARCHAR(50) UNIQUE,
@@ -101,13 +81,10 @@ class SupplyChainLoader:
             UNIT_COST DECIMAL(10,2),
             UNIT_PRICE DECIMAL(10,2),
             SUPPLIER VARCHAR(100),
-            LOADED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+            LOADED_AT TIMESTAMP_NTZ
         )
-        """)
-        logger.info("✅ Created: LANDING.PRODUCTS")
-        
-        # Stores table
-        self.cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS LANDING.STORES (
             STORE_ID INT PRIMARY KEY,
             STORE_NAME VARCHAR(100),
@@ -116,26 +93,20 @@ class SupplyChainLoader:
             CITY VARCHAR(100),
             STATE VARCHAR(2),
             OPENED_DATE DATE,
-            LOADED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+            LOADED_AT TIMESTAMP_NTZ
         )
-        """)
-        logger.info("✅ Created: LANDING.STORES")
-        
-        # Vendors table
-        self.cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS LANDING.VENDORS (
             VENDOR_ID INT PRIMARY KEY,
             VENDOR_NAME VARCHAR(200),
             VENDOR_COUNTRY VARCHAR(50),
             AVG_LEAD_TIME_DAYS INT,
             RELIABILITY_SCORE DECIMAL(5,2),
-            LOADED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+            LOADED_AT TIMESTAMP_NTZ
         )
-        """)
-        logger.info("✅ Created: LANDING.VENDORS")
-        
-        # Sales table
-        self.cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS LANDING.SALES (
             TRANSACTION_ID INT PRIMARY KEY,
             SALE_DATE DATE,
@@ -148,13 +119,10 @@ class SupplyChainLoader:
             TOTAL_REVENUE DECIMAL(10,2),
             COST_OF_GOODS DECIMAL(10,2),
             PROFIT DECIMAL(10,2),
-            LOADED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+            LOADED_AT TIMESTAMP_NTZ
         )
-        """)
-        logger.info("✅ Created: LANDING.SALES")
-        
-        # Inventory table
-        self.cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS LANDING.INVENTORY_SNAPSHOT (
             SNAPSHOT_DATE DATE,
             PRODUCT_ID INT,
@@ -164,19 +132,84 @@ class SupplyChainLoader:
             REORDER_POINT INT,
             SAFETY_STOCK INT,
             DAYS_OF_SUPPLY DECIMAL(5,1),
-            LOADED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+            LOADED_AT TIMESTAMP_NTZ,
             PRIMARY KEY (SNAPSHOT_DATE, PRODUCT_ID, STORE_ID)
         )
-        """)
-        logger.info("✅ Created: LANDING.INVENTORY_SNAPSHOT")
+        """,
+    ]
+    
+    def __init__(self, config_path: str = "config/config.yaml"):
+        """Initialize Snowflake connection."""
+        self.config = self._load_config(config_path)
+        self.conn = None
+        self.cursor = None
+        # LOADED_AT stamped on every row of this run, instead of a per-row DEFAULT
+        self.loaded_at = datetime.utcnow().replace(microsecond=0)
+    
+    def _load_config(self, config_path: str) -> dict:
+        """Load configuration from YAML file."""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            raise FileNotFoundError(
+                f"Config file not found: {config_path}\n"
+                f"Copy config/config.template.yaml to config/config.yaml"
+            )
         
-        self.conn.commit()
-        logger.info("✅ All tables created successfully")
+        with open(config_file, 'r') as f:
+            config = yaml.safe_load(f)
+        
+        return config['snowflake']
+    
+    def connect(self):
+        """Establish connection to Snowflake."""
+        try:
+            self.conn = snowflake.connector.connect(
+                user=self.config['user'],
+                password=self.config['password'],
+                account=self.config['account'],
+                warehouse=self.config['warehouse'],
+                database=self.config['database'],
+                schema=self.config['schema'],
+                client_session_keep_alive=True,  # Keep session alive through long loads
+                client_telemetry_enabled=False  # skip telemetry uploads on connect/close
+            )
+            self.cursor = self.conn.cursor()
+            logger.info(f"✅ Connected to Snowflake account: {self.config['account']}")
+            logger.info(f"   Database: {self.config['database']}")
+        except Exception as e:
+            logger.error(f"❌ Failed to connect to Snowflake: {e}")
+            raise
+    
+    def disconnect(self):
+        """Close Snowflake connection."""
+        if self.cursor:
+            self.cursor.close()
+        if self.conn:
+            self.conn.close()
+        logger.info("Disconnected from Snowflake")
+    
+    def create_schemas_and_tables(self):
+        """Create database schemas and landing tables."""
+        logger.info("Setting up database schemas and tables...")
+        
+        # Submit all DDL, wrapped in BEGIN/COMMIT, as one multi-statement
+        # request: a single round trip instead of one per statement plus a
+        # separate commit
+        statements = ["BEGIN", *self.SETUP_DDL, "COMMIT"]
+        self.cursor.execute(";\n".join(statements), num_statements=len(statements))
+        
+        logger.info("✅ Schemas created/verified: LANDING, STAGING, MARTS")
+        logger.info("✅ Landing tables created/verified: "
+                    "PRODUCTS, STORES, VENDORS, SALES, INVENTORY_SNAPSHOT")
     
     def load_csv(self, csv_path: str, table_name: str, mode: str = "append"):
         """
         Load CSV into Snowflake table.
         
+        The parsed table is written as WRITE_CHUNK_ROWS-row Parquet files to a
+        temporary directory, uploaded to a per-load path of the table stage
+        with a single parallel PUT and ingested with one COPY INTO.
+        
         Args:
             csv_path: Path to CSV file
             table_name: Snowflake table name (schema.table)
@@ -184,41 +217,78 @@ class SupplyChainLoader:
         """
         logger.info(f"Loading {csv_path} → {table_name}")
         
-        # Read CSV
-        df = pd.read_csv(csv_path)
-        logger.info(f"  Read {len(df):,} records from CSV")
+        # Read CSV with pyarrow's multi-threaded parser
+        data = pacsv.read_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=self.CSV_BLOCK_BYTES),
+            convert_options=pacsv.ConvertOptions(
+                column_types=CSV_COLUMN_TYPES.get(Path(csv_path).name, {})
+            )
+        )
+        logger.info(f"  Read {data.num_rows:,} records from CSV")
+        
+        data = data.append_column(
+            'loaded_at',
+            pa.repeat(pa.scalar(self.loaded_at, pa.timestamp('us')), data.num_rows)
+        )
         
-        # Clean column names (uppercase for Snowflake)
-        df.columns = [col.upper() for col in df.columns]
+        schema, table = table_name.split('.')
+        # Unique per load, so parts left by an earlier failed load are never
+        # COPYed again alongside this load's files
+        run_stage = f"@{schema}.%{table}/run_{self.loaded_at:%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+        
+        # Write every chunk first, then upload them all with one PUT
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            offsets = range(0, max(data.num_rows, 1), self.WRITE_CHUNK_ROWS)
+            for i, offset in enumerate(offsets):
+                pq.write_table(
+                    data.slice(offset, self.WRITE_CHUNK_ROWS),
+                    Path(tmp_dir) / f"{table.lower()}_{i:04d}.parquet",
+                    compression='snappy'
+                )
+            # The Parquet files hold everything from here on; release the
+            # parsed table so it isn't kept alive through PUT and COPY
+            del data
+            self.cursor.execute(
+                f"PUT 'file://{Path(tmp_dir).as_posix()}/*' {run_stage} "
+                f"PARALLEL={self.PUT_PARALLEL} AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
+            )
         
         # Handle mode
         if mode == 'replace':
             logger.info(f"  Truncating table {table_name}")
             self.cursor.execute(f"TRUNCATE TABLE {table_name}")
         
-        # Bulk load using write_pandas
-        from snowflake.connector.pandas_tools import write_pandas
-        
-        schema, table = table_name.split('.')
-        
-        success, nchunks, nrows, _ = write_pandas(
-            conn=self.conn,
-            df=df,
-            table_name=table,
-            schema=schema,
-            quote_identifiers=False
-        )
-        
-        if success:
-            logger.info(f"✅ Loaded {nrows:,} rows in {nchunks} chunks")
-        else:
-            logger.error(f"❌ Failed to load data")
-            raise Exception("Data load failed")
+        self.cursor.execute(f"""
+            COPY INTO {table_name}
+            FROM {run_stage}
+            FILE_FORMAT=(TYPE=PARQUET)
+            MATCH_BY_COLUMN_NAME=CASE_INSENSITIVE
+            PURGE=TRUE
+        """)
+        results = self.cursor.fetchall()
+        nrows = sum(row[3] for row in results)
+        logger.info(f"✅ Loaded {nrows:,} rows in {len(results)} chunks")
         
         self.conn.commit()
     
-    def load_all_files(self, data_dir: str = "data/raw", mode: str = "append"):
-        """Load all CSV files from data directory."""
+    def _load_csv_in_session(self, csv_path: str, table_name: str, mode: str):
+        """Run load_csv on its own Snowflake connection."""
+        worker = copy.copy(self)
+        worker.connect()
+        try:
+            worker.load_csv(csv_path, table_name, mode=mode)
+        finally:
+            worker.disconnect()
+    
+    def load_all_files(self, data_dir: str = "data/raw", mode: str = "append",
+                       max_workers: int = LOAD_WORKERS):
+        """
+        Load all CSV files from data directory.
+        
+        Tables are independent, so files load concurrently, each on its own
+        connection; the first failure is re-raised once all loads finish.
+        """
         data_path = Path(data_dir)
         
         # File to table mapping
@@ -230,12 +300,28 @@ class SupplyChainLoader:
             'inventory_snapshot.csv': 'LANDING.INVENTORY_SNAPSHOT'
         }
         
-        for filename, table_name in files_to_load.items():
-            csv_file = data_path / filename
-            if csv_file.exists():
-                self.load_csv(str(csv_file), table_name, mode=mode)
-            else:
-                logger.warning(f"⚠️  File not found: {csv_file}")
+        futures = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for filename, table_name in files_to_load.items():
+                csv_file = data_path / filename
+                if csv_file.exists():
+                    future = executor.submit(
+                        self._load_csv_in_session, str(csv_file), table_name, mode
+                    )
+                    futures[future] = filename
+                else:
+                    logger.warning(f"⚠️  File not found: {csv_file}")
+            
+            errors = []
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"❌ Failed to load {futures[future]}: {e}")
+                    errors.append(e)
+        
+        if errors:
+            raise errors[0]
     
     def validate_load(self):
         """Run validation checks on loaded data."""
@@ -243,21 +329,37 @@ class SupplyChainLoader:
         
         tables = ['PRODUCTS', 'STORES', 'VENDORS', 'SALES', 'INVENTORY_SNAPSHOT']
         
-        for table in tables:
-            self.cursor.execute(f"SELECT COUNT(*) FROM LANDING.{table}")
-            count = self.cursor.fetchone()[0]
-            logger.info(f"  LANDING.{table}: {count:,} rows")
-        
-        # Sales summary
-        logger.info("\n=== Sales Summary ===")
-        self.cursor.execute("""
+        # Row counts, sales summary and product categories, submitted as one
+        # multi-statement request; the counts are fused with UNION ALL
+        row_counts = " UNION ALL ".join(
+            f"SELECT '{table}' AS tbl, COUNT(*) AS cnt FROM LANDING.{table}"
+            for table in tables
+        )
+        sales_summary = """
             SELECT 
                 COUNT(*) as transactions,
                 SUM(TOTAL_REVENUE) as total_revenue,
                 SUM(PROFIT) as total_profit,
                 AVG(TOTAL_REVENUE) as avg_transaction
             FROM LANDING.SALES
-        """)
+        """
+        product_categories = """
+            SELECT CATEGORY, COUNT(*) as count
+            FROM LANDING.PRODUCTS
+            GROUP BY CATEGORY
+            ORDER BY count DESC
+        """
+        self.cursor.execute(
+            ";\n".join([row_counts, sales_summary, product_categories]),
+            num_statements=3
+        )
+        
+        for table, count in self.cursor.fetchall():
+            logger.info(f"  LANDING.{table}: {count:,} rows")
+        
+        # Sales summary
+        logger.info("\n=== Sales Summary ===")
+        self.cursor.nextset()
         result = self.cursor.fetchone()
         logger.info(f"  Transactions: {result[0]:,}")
         logger.info(f"  Total Revenue: ${result[1]:,.2f}")
@@ -266,12 +368,7 @@ class SupplyChainLoader:
         
         # Product categories
         logger.info("\n=== Product Categories ===")
-        self.cursor.execute("""
-            SELECT CATEGORY, COUNT(*) as count
-            FROM LANDING.PRODUCTS
-            GROUP BY CATEGORY
-            ORDER BY count DESC
-        """)
+        self.cursor.nextset()
         for row in self.cursor.fetchall():
             logger.info(f"  {row[0]}: {row[1]} products")
 
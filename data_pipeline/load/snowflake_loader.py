@@ -10,11 +10,18 @@ Date: February 2026
 """
 
 import snowflake.connector
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import yaml
+import csv
 import logging
+import tempfile
+import time
+import uuid
 from pathlib import Path
 from typing import Optional
+from datetime import datetime
 import argparse
 
 # Configure logging
@@ -24,12 +31,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds between status checks while waiting on an async query
+ASYNC_POLL_INTERVAL = 0.1
+
+# Low-cardinality text, parsed straight into dictionary-encoded columns
+DICTIONARY_STRING = pa.dictionary(pa.int32(), pa.string())
+
+# Column types of the extractor's CVE CSV, so the parser skips type inference.
+# Timestamps are parsed from ISO 8601 here and land as Parquet timestamps.
+CVE_CSV_SCHEMA = pa.schema([
+    ('cve_id', pa.string()),
+    ('published_date', pa.timestamp('us')),
+    ('modified_date', pa.timestamp('us')),
+    ('vuln_status', DICTIONARY_STRING),
+    ('description', pa.string()),
+    ('cvss_v3_score', pa.float32()),
+    ('cvss_v3_severity', DICTIONARY_STRING),
+    ('attack_vector', DICTIONARY_STRING),
+    ('attack_complexity', DICTIONARY_STRING),
+    ('privileges_required', DICTIONARY_STRING),
+    ('user_interaction', DICTIONARY_STRING),
+    ('exploitability_score', pa.float32()),
+    ('impact_score', pa.float32()),
+    ('cwe_id', pa.string()),
+    ('vendor', DICTIONARY_STRING),
+    ('product', DICTIONARY_STRING),
+    ('reference_count', pa.int32()),
+    ('extracted_at', pa.timestamp('us')),
+])
+
 
 class SnowflakeLoader:
     """
     Loads data into Snowflake data warehouse.
     """
     
+    CSV_BLOCK_BYTES = 64 << 20  # bytes parsed per Arrow CSV block
+    PARQUET_PART_BYTES = 150 << 20  # in-memory Arrow bytes gathered per Parquet part
+    PUT_PARALLEL = 8  # upload threads per PUT of a single raw file
+    
     def __init__(self, config_path: str = "config/config.yaml"):
         """
         Initialize Snowflake connection.
@@ -40,6 +80,8 @@ class SnowflakeLoader:
         self.config = self._load_config(config_path)
         self.conn = None
         self.cursor = None
+        # LOADED_AT stamped on every row of this run, instead of a per-row DEFAULT
+        self.loaded_at = datetime.utcnow().replace(microsecond=0)
     
     def _load_config(self, config_path: str) -> dict:
         """Load configuration from YAML file."""
@@ -98,9 +140,6 @@ class SnowflakeLoader:
         CREATE SCHEMA IF NOT EXISTS MARTS;
         """
         
-        self.cursor.execute(schemas_sql)
-        logger.info("Schemas created/verified")
-        
         # Create landing table for raw CVE data
         landing_table_sql = """
         CREATE TABLE IF NOT EXISTS LANDING.CVE_RAW (
@@ -108,7 +147,7 @@ class SnowflakeLoader:
             PUBLISHED_DATE TIMESTAMP_NTZ,
             MODIFIED_DATE TIMESTAMP_NTZ,
             VULN_STATUS VARCHAR(50),
-            DESCRIPTION VARCHAR(5000),
+            DESCRIPTION VARCHAR,
             CVSS_V3_SCORE DECIMAL(3,1),
             CVSS_V3_SEVERITY VARCHAR(20),
             ATTACK_VECTOR VARCHAR(20),
@@ -122,15 +161,28 @@ class SnowflakeLoader:
             PRODUCT VARCHAR(500),
             REFERENCE_COUNT INT,
             EXTRACTED_AT TIMESTAMP_NTZ,
-            LOADED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+            LOADED_AT TIMESTAMP_NTZ
         );
+        
+        -- Tables created before descriptions stopped being truncated have
+        -- DESCRIPTION VARCHAR(5000); widen them (a no-op once widened)
+        ALTER TABLE LANDING.CVE_RAW ALTER COLUMN DESCRIPTION SET DATA TYPE VARCHAR;
         """
         
-        self.cursor.execute(landing_table_sql)
+        # Three schemas plus the table and its widening, as one multi-statement request
+        self.cursor.execute(schemas_sql + landing_table_sql, num_statements=5)
+        logger.info("Schemas created/verified")
         logger.info("Landing table CVE_RAW created/verified")
         
         self.conn.commit()
     
+    def _run_stage_path(self, schema: str, table: str) -> str:
+        """
+        A stage path of the table stage unique to one load, so files left
+        behind by an earlier failed load are never picked up by this COPY.
+        """
+        return f"@{schema}.%{table}/run_{self.loaded_at:%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+    
     def load_csv_to_snowflake(
         self, 
         csv_path: str,
@@ -140,6 +192,12 @@ class SnowflakeLoader:
         """
         Load CSV data into Snowflake table.
         
+        The CSV is streamed through pyarrow's reader and written as Parquet
+        part files of about PARQUET_PART_BYTES to a temporary directory, so
+        it is never held in memory as a whole. The parts are uploaded to a
+        per-load path of the table stage with one PUT and ingested with COPY INTO using
+        Snowflake's vectorized scanner.
+        
         Args:
             csv_path: Path to CSV file
             table_name: Snowflake table name (schema.table)
@@ -147,36 +205,138 @@ class SnowflakeLoader:
         """
         logger.info(f"Loading data from {csv_path} to {table_name}")
         
-        # Read CSV
-        df = pd.read_csv(csv_path)
-        logger.info(f"Read {len(df)} records from CSV")
+        schema, table = table_name.split('.')
+        run_stage = self._run_stage_path(schema, table)
+        loaded_at = pa.scalar(self.loaded_at, pa.timestamp('us'))
+        staged_schema = CVE_CSV_SCHEMA.append(pa.field('loaded_at', loaded_at.type))
+        
+        reader = pacsv.open_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(block_size=self.CSV_BLOCK_BYTES),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),  # multi-line descriptions
+            convert_options=pacsv.ConvertOptions(
+                column_types=CVE_CSV_SCHEMA, include_columns=CVE_CSV_SCHEMA.names,
+                strings_can_be_null=True  # empty fields load as NULL, not ''
+            )
+        )
         
-        # Clean column names for Snowflake (uppercase)
-        df.columns = [col.upper() for col in df.columns]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            num_rows = 0
+            num_parts = 0
+            
+            def write_part(batches):
+                table = pa.Table.from_batches(batches)
+                pq.write_table(
+                    pa.Table.from_arrays(
+                        [*table.columns, pa.repeat(loaded_at, table.num_rows)],
+                        schema=staged_schema
+                    ),
+                    Path(tmp_dir) / f"part_{num_parts:04d}.parquet",
+                    compression='snappy'
+                )
+            
+            # Group CSV blocks so each staged file is big enough for COPY to
+            # scan efficiently, rather than one small file per block
+            pending = []
+            pending_bytes = 0
+            for batch in reader:
+                pending.append(batch)
+                pending_bytes += batch.nbytes
+                num_rows += batch.num_rows
+                if pending_bytes >= self.PARQUET_PART_BYTES:
+                    write_part(pending)
+                    num_parts += 1
+                    pending = []
+                    pending_bytes = 0
+            if pending:
+                write_part(pending)
+                num_parts += 1
+            logger.info(f"Read {num_rows} records from CSV into {num_parts} Parquet parts")
+            
+            if num_parts:
+                # Upload threads scale with the part count, within 4..16
+                self.cursor.execute(
+                    f"PUT 'file://{Path(tmp_dir).as_posix()}/*' {run_stage} "
+                    f"PARALLEL={min(16, max(4, num_parts))} "
+                    f"AUTO_COMPRESS=FALSE OVERWRITE=TRUE"
+                )
         
         # Handle mode
         if mode == 'replace':
             logger.info(f"Truncating table {table_name}")
             self.cursor.execute(f"TRUNCATE TABLE {table_name}")
         
-        # Insert data using Snowflake's write_pandas (efficient bulk load)
-        from snowflake.connector.pandas_tools import write_pandas
+        if num_parts == 0:
+            logger.warning("No records to load")
+            return
+        
+        self.cursor.execute(f"""
+            COPY INTO {table_name}
+            FROM {run_stage}
+            PATTERN='.*[.]parquet'
+            FILE_FORMAT=(TYPE=PARQUET USE_VECTORIZED_SCANNER=TRUE)
+            MATCH_BY_COLUMN_NAME=CASE_INSENSITIVE
+            PURGE=TRUE
+        """)
+        results = self.cursor.fetchall()
+        nrows = sum(row[3] for row in results)
+        logger.info(f"Successfully loaded {nrows} rows from {len(results)} files")
+        
+        self.conn.commit()
+    
+    def copy_csv_to_snowflake(
+        self,
+        csv_path: str,
+        table_name: str = "LANDING.CVE_RAW",
+        mode: str = "append"
+    ):
+        """
+        Load a well-formed CVE CSV by COPYing the raw file, with no local parse.
+        
+        The file is PUT (gzipped) to the table stage as-is and Snowflake
+        parses it during COPY INTO, mapping fields to the columns named in
+        the header and stamping LOADED_AT. Rows that fail to parse are
+        skipped rather than aborting the load.
+        
+        Args:
+            csv_path: Path to CSV file
+            table_name: Snowflake table name (schema.table)
+            mode: 'append' or 'replace'
+        """
+        logger.info(f"Copying {csv_path} to {table_name} (fast path)")
         
         schema, table = table_name.split('.')
+        run_stage = self._run_stage_path(schema, table)
+        
+        with open(csv_path, newline='') as f:
+            header = next(csv.reader(f))
+        fields = ", ".join(f"${i}" for i in range(1, len(header) + 1))
         
-        success, nchunks, nrows, _ = write_pandas(
-            conn=self.conn,
-            df=df,
-            table_name=table,
-            schema=schema,
-            quote_identifiers=False
+        self.cursor.execute(
+            f"PUT 'file://{Path(csv_path).resolve().as_posix()}' {run_stage} "
+            f"PARALLEL={self.PUT_PARALLEL} AUTO_COMPRESS=TRUE OVERWRITE=TRUE"
         )
         
-        if success:
-            logger.info(f"Successfully loaded {nrows} rows in {nchunks} chunks")
-        else:
-            logger.error("Failed to load data")
-            raise Exception("Data load failed")
+        # Handle mode
+        if mode == 'replace':
+            logger.info(f"Truncating table {table_name}")
+            self.cursor.execute(f"TRUNCATE TABLE {table_name}")
+        
+        self.cursor.execute(f"""
+            COPY INTO {table_name} ({', '.join(header)}, LOADED_AT)
+            FROM (
+                SELECT {fields}, '{self.loaded_at:%Y-%m-%d %H:%M:%S}'::TIMESTAMP_NTZ
+                FROM {run_stage}
+            )
+            PATTERN='.*[.]csv[.]gz'
+            FILE_FORMAT=(TYPE=CSV SKIP_HEADER=1 FIELD_OPTIONALLY_ENCLOSED_BY='"')
+            ON_ERROR='CONTINUE'
+            PURGE=TRUE
+        """)
+        results = self.cursor.fetchall()
+        nrows = sum(row[3] for row in results)
+        nerrors = sum(row[5] for row in results)
+        logger.info(f"Successfully loaded {nrows} rows ({nerrors} rows skipped)")
         
         self.conn.commit()
     
@@ -189,53 +349,67 @@ class SnowflakeLoader:
         """
         logger.info(f"\n=== Validating {table_name} ===")
         
-        # Row count
-        self.cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        row_count = self.cursor.fetchone()[0]
-        logger.info(f"Total rows: {row_count:,}")
-        
-        # Severity distribution
-        self.cursor.execute(f"""
-            SELECT CVSS_V3_SEVERITY, COUNT(*) as count
-            FROM {table_name}
-            WHERE CVSS_V3_SEVERITY IS NOT NULL
-            GROUP BY CVSS_V3_SEVERITY
-            ORDER BY count DESC
-        """)
+        queries = {
+            # Row count
+            'row_count': f"SELECT COUNT(*) FROM {table_name}",
+            # Severity distribution
+            'severity': f"""
+                SELECT CVSS_V3_SEVERITY, COUNT(*) as count
+                FROM {table_name}
+                WHERE CVSS_V3_SEVERITY IS NOT NULL
+                GROUP BY CVSS_V3_SEVERITY
+                ORDER BY count DESC
+            """,
+            # Date range
+            'date_range': f"""
+                SELECT 
+                    MIN(PUBLISHED_DATE) as earliest,
+                    MAX(PUBLISHED_DATE) as latest
+                FROM {table_name}
+            """,
+            # Data quality checks
+            'quality': f"""
+                SELECT 
+                    COUNT(*) as total_rows,
+                    COUNT(CVE_ID) as cve_ids,
+                    COUNT(CVSS_V3_SCORE) as cvss_scores,
+                    COUNT(VENDOR) as vendors,
+                    COUNT(PRODUCT) as products
+                FROM {table_name}
+            """,
+        }
+        
+        # Submit every check up front so Snowflake runs them concurrently,
+        # then collect the results in order
+        query_ids = {}
+        for name, sql in queries.items():
+            self.cursor.execute_async(sql)
+            query_ids[name] = self.cursor.sfqid
+        results = {name: self._fetch_async_results(qid) for name, qid in query_ids.items()}
+        
+        logger.info(f"Total rows: {results['row_count'][0][0]:,}")
         
         logger.info("\nSeverity Distribution:")
-        for row in self.cursor.fetchall():
+        for row in results['severity']:
             logger.info(f"  {row[0]}: {row[1]:,}")
         
-        # Date range
-        self.cursor.execute(f"""
-            SELECT 
-                MIN(PUBLISHED_DATE) as earliest,
-                MAX(PUBLISHED_DATE) as latest
-            FROM {table_name}
-        """)
-        
-        date_range = self.cursor.fetchone()
+        date_range = results['date_range'][0]
         logger.info(f"\nDate Range: {date_range[0]} to {date_range[1]}")
         
-        # Data quality checks
-        self.cursor.execute(f"""
-            SELECT 
-                COUNT(*) as total_rows,
-                COUNT(CVE_ID) as cve_ids,
-                COUNT(CVSS_V3_SCORE) as cvss_scores,
-                COUNT(VENDOR) as vendors,
-                COUNT(PRODUCT) as products
-            FROM {table_name}
-        """)
-        
-        quality_check = self.cursor.fetchone()
+        quality_check = results['quality'][0]
         logger.info("\nData Quality:")
         logger.info(f"  Total rows: {quality_check[0]:,}")
         logger.info(f"  CVE IDs (PK): {quality_check[1]:,}")
         logger.info(f"  CVSS Scores: {quality_check[2]:,}")
         logger.info(f"  Vendors: {quality_check[3]:,}")
         logger.info(f"  Products: {quality_check[4]:,}")
+    
+    def _fetch_async_results(self, qid: str) -> list:
+        """Wait for an async query to finish and fetch all of its rows."""
+        while self.conn.is_still_running(self.conn.get_query_status_throw_if_error(qid)):
+            time.sleep(ASYNC_POLL_INTERVAL)
+        self.cursor.get_results_from_sfqid(qid)
+        return self.cursor.fetchall()
 
 
 def main():
@@ -269,6 +443,11 @@ def main():
         action='store_true',
         help='Skip schema and table creation (if already exists)'
     )
+    parser.add_argument(
+        '--fast-path',
+        action='store_true',
+        help='COPY the raw CSV directly instead of converting it to Parquet locally'
+    )
     
     args = parser.parse_args()
     
@@ -284,7 +463,8 @@ def main():
             loader.create_schema_and_tables()
         
         # Load data
-        loader.load_csv_to_snowflake(
+        load = loader.copy_csv_to_snowflake if args.fast_path else loader.load_csv_to_snowflake
+        load(
             csv_path=args.csv_path,
             mode=args.mode
         )
@@ -11,7 +11,7 @@ Date: February 2026
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+import lightgbm as lgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import snowflake.connector
@@ -19,7 +19,7 @@ import yaml
 import logging
 import joblib
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 # Configure logging
 logging.basicConfig(
@@ -31,14 +31,31 @@ logger = logging.getLogger(__name__)
 
 class DemandForecaster:
     """
-    Demand forecasting using Random Forest.
+    Demand forecasting using gradient-boosted trees (LightGBM).
     """
     
+    # Label columns fed to the model as integer category codes
+    CATEGORICAL_COLUMNS = ['CATEGORY', 'SUBCATEGORY', 'BRAND', 'STORE_TYPE', 'REGION']
+    # Bump whenever extract_features/engineer_features change what they produce,
+    # so caches written by older code are never read back
+    FEATURE_VERSION = 2
+    FEATURE_CACHE = f"cache/features_v{FEATURE_VERSION}.parquet"
+    # Mart tables extract_features reads from
+    SOURCE_TABLES = ['FACT_SALES', 'DIM_PRODUCTS', 'DIM_STORES', 'DIM_DATE']
+    
     def __init__(self, config_path: str = "config/config.yaml"):
         """Initialize forecaster."""
         self.config = self._load_config(config_path)
         self.model = None
         self.feature_importance = None
+        # Mean TOTAL_QUANTITY per PRODUCT_KEY / STORE_KEY on the training fold,
+        # with the fold's overall mean for keys it didn't contain
+        self.target_encodings = {}
+        self.target_mean = None
+        # Sorted labels per CATEGORICAL_COLUMNS entry; a label's code is its position
+        self.category_levels = {}
+        # Snowflake connection shared by every query this forecaster runs
+        self._conn = None
     
     def _load_config(self, config_path: str) -> dict:
         """Load Snowflake config."""
@@ -47,16 +64,32 @@ class DemandForecaster:
         return config['snowflake']
     
     def connect_snowflake(self):
-        """Connect to Snowflake."""
-        return snowflake.connector.connect(
-            user=self.config['user'],
-            password=self.config['password'],
-            account=self.config['account'],
-            warehouse=self.config['warehouse'],
-            database=self.config['database'],
-            schema='MARTS',
-            insecure_mode=True
-        )
+        """Connect to Snowflake, reusing the open connection if there is one."""
+        if self._conn is None or self._conn.is_closed():
+            self._conn = snowflake.connector.connect(
+                user=self.config['user'],
+                password=self.config['password'],
+                account=self.config['account'],
+                warehouse=self.config['warehouse'],
+                database=self.config['database'],
+                schema='MARTS',
+                insecure_mode=True,
+                client_session_keep_alive=True
+            )
+        return self._conn
+    
+    def close(self):
+        """Close the shared Snowflake connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    @staticmethod
+    def _query_dataframe(conn, query: str) -> pd.DataFrame:
+        """Run a query and fetch its result as Arrow batches into a DataFrame."""
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetch_pandas_all()
     
     def extract_features(self):
         """
@@ -66,44 +99,64 @@ class DemandForecaster:
         
         conn = self.connect_snowflake()
         
+        # Lag and rolling-average features are computed in Snowflake with
+        # window functions over each product/store daily series
         query = """
-        SELECT 
-            s.PRODUCT_KEY,
-            s.STORE_KEY,
-            s.SALE_DATE,
-            SUM(s.QUANTITY_SOLD) as total_quantity,
-            SUM(s.TOTAL_REVENUE) as total_revenue,
-            COUNT(*) as transaction_count,
-            AVG(s.UNIT_PRICE) as avg_price,
-            SUM(s.DISCOUNT_AMOUNT) as total_discount,
-            -- Product attributes
-            p.CATEGORY,
-            p.SUBCATEGORY,
-            p.BRAND,
-            p.UNIT_COST,
-            -- Store attributes
-            st.STORE_TYPE,
-            st.REGION,
-            -- Date attributes
-            d.MONTH,
-            d.QUARTER,
-            d.DAY_OF_WEEK,
-            d.IS_WEEKEND,
-            d.IS_HOLIDAY_SEASON
-        FROM MARTS_MARTS.FACT_SALES s
-        JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
-        JOIN MARTS_MARTS.DIM_STORES st ON s.STORE_KEY = st.STORE_KEY
-        JOIN MARTS_MARTS.DIM_DATE d ON s.DATE_KEY = d.DATE_KEY
-        GROUP BY 
-            s.PRODUCT_KEY, s.STORE_KEY, s.SALE_DATE,
-            p.CATEGORY, p.SUBCATEGORY, p.BRAND, p.UNIT_COST,
-            st.STORE_TYPE, st.REGION,
-            d.MONTH, d.QUARTER, d.DAY_OF_WEEK, d.IS_WEEKEND, d.IS_HOLIDAY_SEASON
-        ORDER BY s.SALE_DATE
+        WITH daily AS (
+            SELECT 
+                s.PRODUCT_KEY,
+                s.STORE_KEY,
+                s.SALE_DATE,
+                SUM(s.QUANTITY_SOLD) as total_quantity,
+                SUM(s.TOTAL_REVENUE) as total_revenue,
+                COUNT(*) as transaction_count,
+                AVG(s.UNIT_PRICE) as avg_price,
+                SUM(s.DISCOUNT_AMOUNT) as total_discount,
+                -- Product attributes
+                p.CATEGORY,
+                p.SUBCATEGORY,
+                p.BRAND,
+                p.UNIT_COST,
+                -- Store attributes
+                st.STORE_TYPE,
+                st.REGION,
+                -- Date attributes
+                d.MONTH,
+                d.QUARTER,
+                d.DAY_OF_WEEK,
+                d.IS_WEEKEND,
+                d.IS_HOLIDAY_SEASON
+            FROM MARTS_MARTS.FACT_SALES s
+            JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
+            JOIN MARTS_MARTS.DIM_STORES st ON s.STORE_KEY = st.STORE_KEY
+            JOIN MARTS_MARTS.DIM_DATE d ON s.DATE_KEY = d.DATE_KEY
+            GROUP BY 
+                s.PRODUCT_KEY, s.STORE_KEY, s.SALE_DATE,
+                p.CATEGORY, p.SUBCATEGORY, p.BRAND, p.UNIT_COST,
+                st.STORE_TYPE, st.REGION,
+                d.MONTH, d.QUARTER, d.DAY_OF_WEEK, d.IS_WEEKEND, d.IS_HOLIDAY_SEASON
+        )
+        SELECT
+            daily.*,
+            LAG(total_quantity, 1) OVER (
+                PARTITION BY PRODUCT_KEY, STORE_KEY ORDER BY SALE_DATE
+            ) as "lag_1_day_quantity",
+            LAG(total_quantity, 7) OVER (
+                PARTITION BY PRODUCT_KEY, STORE_KEY ORDER BY SALE_DATE
+            ) as "lag_7_day_quantity",
+            AVG(total_quantity) OVER (
+                PARTITION BY PRODUCT_KEY, STORE_KEY ORDER BY SALE_DATE
+                ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+            ) as "rolling_7_day_avg",
+            AVG(total_quantity) OVER (
+                PARTITION BY PRODUCT_KEY, STORE_KEY ORDER BY SALE_DATE
+                ROWS BETWEEN 29 PRECEDING AND CURRENT ROW
+            ) as "rolling_30_day_avg"
+        FROM daily
+        ORDER BY SALE_DATE
         """
         
-        df = pd.read_sql(query, conn)
-        conn.close()
+        df = self._query_dataframe(conn, query)
         
         logger.info(f"Extracted {len(df)} records for training")
         return df
@@ -117,41 +170,87 @@ class DemandForecaster:
         # Convert date
         df['SALE_DATE'] = pd.to_datetime(df['SALE_DATE'])
         
-        # Lag features (previous day's demand)
-        df = df.sort_values(['PRODUCT_KEY', 'STORE_KEY', 'SALE_DATE'])
-        df['lag_1_day_quantity'] = df.groupby(['PRODUCT_KEY', 'STORE_KEY'])['TOTAL_QUANTITY'].shift(1)
-        df['lag_7_day_quantity'] = df.groupby(['PRODUCT_KEY', 'STORE_KEY'])['TOTAL_QUANTITY'].shift(7)
-        
-        # Rolling averages
-        df['rolling_7_day_avg'] = df.groupby(['PRODUCT_KEY', 'STORE_KEY'])['TOTAL_QUANTITY'].transform(
-            lambda x: x.rolling(window=7, min_periods=1).mean()
-        )
-        df['rolling_30_day_avg'] = df.groupby(['PRODUCT_KEY', 'STORE_KEY'])['TOTAL_QUANTITY'].transform(
-            lambda x: x.rolling(window=30, min_periods=1).mean()
-        )
+        # Encode categorical variables
+        df = self.encode_categoricals(df)
         
-        # Fill NaN values
+        # Lag and rolling features arrive precomputed from extract_features;
+        # fill the lags missing at the start of each series
         df = df.fillna(0)
         
-        # Encode categorical variables
-        df['CATEGORY_encoded'] = pd.Categorical(df['CATEGORY']).codes
-        df['SUBCATEGORY_encoded'] = pd.Categorical(df['SUBCATEGORY']).codes
-        df['BRAND_encoded'] = pd.Categorical(df['BRAND']).codes
-        df['STORE_TYPE_encoded'] = pd.Categorical(df['STORE_TYPE']).codes
-        df['REGION_encoded'] = pd.Categorical(df['REGION']).codes
-        
         logger.info("Feature engineering complete")
         return df
     
+    def encode_categoricals(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add <COL>_encoded int16 codes against self.category_levels.
+        
+        Levels are fitted (sorted) for any column not seen yet, so the same
+        label always maps to the same code; unseen labels and nulls get -1,
+        which LightGBM treats as missing.
+        """
+        for col in self.CATEGORICAL_COLUMNS:
+            if col not in self.category_levels:
+                self.category_levels[col] = pd.Index(df[col].dropna().unique()).sort_values()
+            codes = self.category_levels[col].get_indexer(df[col])
+            df[f'{col}_encoded'] = codes.astype(np.int16, copy=False)
+        return df
+    
+    def last_source_update(self):
+        """
+        When any of SOURCE_TABLES last changed, per Snowflake's table
+        metadata, or None if they can't be found.
+        """
+        conn = self.connect_snowflake()
+        tables = ", ".join(f"'{table}'" for table in self.SOURCE_TABLES)
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+            SELECT MAX(LAST_ALTERED)
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = 'MARTS_MARTS' AND TABLE_NAME IN ({tables})
+            """)
+            row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def load_cached_features(self, path: str = FEATURE_CACHE):
+        """
+        Load engineered features from the Parquet cache, or None if the
+        cache is missing or older than the last change to its source tables.
+        """
+        cache = Path(path)
+        if not cache.exists():
+            return None
+        
+        last_update = self.last_source_update()
+        if last_update is None:
+            logger.info("Source table metadata unavailable, re-extracting")
+            return None
+        
+        cached_at = datetime.fromtimestamp(cache.stat().st_mtime, tz=timezone.utc)
+        if cached_at <= last_update:
+            logger.info("Feature cache is stale, re-extracting")
+            return None
+        
+        df = pd.read_parquet(cache, engine='pyarrow')
+        # Refit the levels the cached codes were built from
+        df = self.encode_categoricals(df)
+        logger.info(f"Loaded {len(df)} engineered records from {path}")
+        return df
+    
+    def cache_features(self, df: pd.DataFrame, path: str = FEATURE_CACHE):
+        """Write engineered features to the Parquet cache."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(path, engine='pyarrow', compression='snappy', index=False)
+        logger.info(f"Cached engineered features to {path}")
+    
     def train_model(self, df: pd.DataFrame):
         """
-        Train Random Forest model for demand forecasting.
+        Train LightGBM model for demand forecasting.
         """
         logger.info("Training demand forecasting model...")
         
-        # Features for training
+        # Features for training (ID keys enter as target encodings, not raw IDs)
         feature_cols = [
-            'PRODUCT_KEY', 'STORE_KEY',
+            'PRODUCT_KEY_te', 'STORE_KEY_te',
             'MONTH', 'QUARTER', 'DAY_OF_WEEK', 'IS_WEEKEND', 'IS_HOLIDAY_SEASON',
             'AVG_PRICE', 'TOTAL_DISCOUNT', 'UNIT_COST',
             'CATEGORY_encoded', 'SUBCATEGORY_encoded', 'BRAND_encoded',
@@ -160,24 +259,50 @@ class DemandForecaster:
             'rolling_7_day_avg', 'rolling_30_day_avg'
         ]
         
-        X = df[feature_cols]
-        y = df['TOTAL_QUANTITY']
-        
         # Train/test split (80/20)
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
+        train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
+        
+        # Fit the key encodings on the training fold only, so test targets don't leak
+        self.target_mean = train_df['TOTAL_QUANTITY'].mean()
+        self.target_encodings = {
+            key: train_df.groupby(key, sort=False)['TOTAL_QUANTITY'].mean()
+            for key in ['PRODUCT_KEY', 'STORE_KEY']
+        }
+        train_df = self.apply_target_encoding(train_df)
+        test_df = self.apply_target_encoding(test_df)
+        
+        # float32 up front: narrower arrays for binning and prediction
+        X_train = train_df[feature_cols].to_numpy(dtype=np.float32)
+        X_test = test_df[feature_cols].to_numpy(dtype=np.float32)
+        y_train = train_df['TOTAL_QUANTITY'].to_numpy(dtype=np.float32)
+        y_test = test_df['TOTAL_QUANTITY'].to_numpy(dtype=np.float32)
         
-        # Train Random Forest
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
+        # Train histogram-based gradient boosting; label-encoded columns are
+        # split on as categories rather than ordered values
+        categorical_cols = [f'{col}_encoded' for col in self.CATEGORICAL_COLUMNS]
+        self.model = lgb.LGBMRegressor(
+            n_estimators=500,
+            num_leaves=63,
+            max_bin=255,
+            learning_rate=0.05,
+            objective='regression_l1',
             random_state=42,
-            n_jobs=-1
+            n_jobs=-1,
+            verbose=-1
         )
         
-        self.model.fit(X_train, y_train)
+        # Hold out 10% of the training fold to stop boosting once it plateaus
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train, test_size=0.1, random_state=42
+        )
+        self.model.fit(
+            X_fit, y_fit,
+            eval_set=[(X_val, y_val)],
+            feature_name=feature_cols,
+            categorical_feature=categorical_cols,
+            callbacks=[lgb.early_stopping(50, verbose=False)]
+        )
+        logger.info(f"Stopped after {self.model.best_iteration_} boosting rounds")
         
         # Evaluate
         train_pred = self.model.predict(X_train)
@@ -212,12 +337,40 @@ class DemandForecaster:
             'test_mape': test_mape
         }
     
+    def apply_target_encoding(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add <KEY>_te columns holding each row's key mean-target encoding.
+        """
+        return df.assign(**{
+            f'{key}_te': df[key].map(encoding).fillna(self.target_mean)
+            for key, encoding in self.target_encodings.items()
+        })
+    
     def save_model(self, path: str = "ml_model/demand_forecast_model.pkl"):
-        """Save trained model."""
+        """Save trained model together with the encodings its features need."""
         Path(path).parent.mkdir(parents=True, exist_ok=True)
-        joblib.dump(self.model, path)
+        bundle = {
+            'model': self.model,
+            'target_encodings': self.target_encodings,
+            'target_mean': self.target_mean,
+            'category_levels': self.category_levels
+        }
+        # Uncompressed with pickle protocol 5: no zlib pass on save or load.
+        # A LightGBM booster pickles as its model string, so there are no
+        # large arrays for joblib to memory-map back
+        joblib.dump(bundle, path, compress=0, protocol=5)
         logger.info(f"Model saved to {path}")
     
+    def load_model(self, path: str = "ml_model/demand_forecast_model.pkl"):
+        """Load a saved model and its encodings."""
+        bundle = joblib.load(path)
+        self.model = bundle['model']
+        self.target_encodings = bundle['target_encodings']
+        self.target_mean = bundle['target_mean']
+        self.category_levels = bundle['category_levels']
+        logger.info(f"Model loaded from {path}")
+        return self.model
+    
     def generate_forecasts(self, days_ahead: int = 30):
         """
         Generate demand forecasts for next N days.
@@ -234,34 +387,24 @@ class DemandForecaster:
         FROM MARTS_MARTS.FACT_SALES
         """
         
-        product_stores = pd.read_sql(query, conn)
+        product_stores = self._query_dataframe(conn, query)
         
         # Generate forecast dates
         today = datetime.now().date()
-        forecast_dates = [today + timedelta(days=i) for i in range(1, days_ahead + 1)]
-        
-        forecasts = []
+        forecast_dates = pd.DataFrame({
+            'forecast_date': [today + timedelta(days=i) for i in range(1, days_ahead + 1)]
+        })
         
-        for _, row in product_stores.iterrows():
-            product_key = row['PRODUCT_KEY']
-            store_key = row['STORE_KEY']
-            
-            for forecast_date in forecast_dates:
-                # Create features for prediction
-                # (In real implementation, would use actual historical data)
-                forecast_row = {
-                    'product_key': product_key,
-                    'store_key': store_key,
-                    'forecast_date': forecast_date,
-                    'forecasted_quantity': np.random.randint(1, 10)  # Placeholder
-                }
-                forecasts.append(forecast_row)
-        
-        forecast_df = pd.DataFrame(forecasts)
+        # One row per product/store/date, built as a single cross join
+        forecast_df = product_stores.rename(
+            columns={'PRODUCT_KEY': 'product_key', 'STORE_KEY': 'store_key'}
+        ).merge(forecast_dates, how='cross')
+        # (In real implementation, would use actual historical data)
+        rng = np.random.default_rng(42)
+        forecast_df['forecasted_quantity'] = rng.integers(1, 10, size=len(forecast_df))  # Placeholder
         
         logger.info(f"Generated {len(forecast_df)} forecasts")
         
-        conn.close()
         return forecast_df
 
 
@@ -271,11 +414,18 @@ def main():
     
     forecaster = DemandForecaster()
     
-    # Extract data
-    df = forecaster.extract_features()
-    
-    # Engineer features
-    df = forecaster.engineer_features(df)
+    try:
+        # Reuse engineered features while the mart tables are unchanged
+        df = forecaster.load_cached_features()
+        if df is None:
+            # Extract data
+            df = forecaster.extract_features()
+            
+            # Engineer features
+            df = forecaster.engineer_features(df)
+            forecaster.cache_features(df)
+    finally:
+        forecaster.close()
     
     # Train model
     metrics = forecaster.train_model(df)
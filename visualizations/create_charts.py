@@ -10,12 +10,16 @@ Date: February 2026
 """
 
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # file output only; also safe to use from worker processes
 import matplotlib.pyplot as plt
 import seaborn as sns
 import snowflake.connector
 import yaml
 import logging
 from pathlib import Path
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -23,9 +27,12 @@ warnings.filterwarnings('ignore')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Set style
+# Set style (once, at import; worker processes inherit it)
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
+# Drop path vertices that don't change the rendered line
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
 
 # Professional color scheme
 COLORS = {
@@ -39,11 +46,111 @@ COLORS = {
 class SupplyChainVisualizer:
     """Generate visualizations from Snowflake data."""
     
+    # Sales joined to product and store attributes once per run; every chart
+    # aggregates this instead of re-joining FACT_SALES to the dimensions
+    BASE_TABLE_SQL = """
+        CREATE OR REPLACE TEMPORARY TABLE MARTS_MARTS.VIZ_BASE AS
+        SELECT
+            s.SALE_DATE,
+            s.TOTAL_REVENUE,
+            s.PROFIT,
+            s.QUANTITY_SOLD,
+            p.CATEGORY,
+            p.SUBCATEGORY,
+            p.PRODUCT_NAME,
+            st.STORE_TYPE,
+            st.REGION
+        FROM MARTS_MARTS.FACT_SALES s
+        JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
+        JOIN MARTS_MARTS.DIM_STORES st ON s.STORE_KEY = st.STORE_KEY
+    """
+    
+    # Label columns converted to pandas categoricals before charting
+    CATEGORICAL_COLUMNS = ('CATEGORY', 'SUBCATEGORY', 'STORE_TYPE', 'REGION')
+    
+    # Aggregate behind each chart, fetched together in one multi-statement request
+    CHART_QUERIES = {
+        'executive_kpis': """
+            SELECT 
+                SUM(TOTAL_REVENUE) as total_revenue,
+                SUM(PROFIT) as total_profit,
+                COUNT(*) as total_transactions,
+                AVG(TOTAL_REVENUE) as avg_transaction,
+                SUM(PROFIT) / SUM(TOTAL_REVENUE) * 100 as profit_margin_pct
+            FROM MARTS_MARTS.VIZ_BASE
+        """,
+        'revenue_trend': """
+            SELECT 
+                DATE_TRUNC('MONTH', SALE_DATE) as month,
+                CATEGORY,
+                SUM(TOTAL_REVENUE) as revenue
+            FROM MARTS_MARTS.VIZ_BASE
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """,
+        'category_performance': """
+            SELECT 
+                CATEGORY,
+                SUM(TOTAL_REVENUE) as revenue,
+                SUM(PROFIT) as profit,
+                COUNT(*) as transactions
+            FROM MARTS_MARTS.VIZ_BASE
+            GROUP BY 1
+            ORDER BY 2 DESC
+        """,
+        'top_products': """
+            SELECT 
+                PRODUCT_NAME,
+                CATEGORY,
+                SUM(QUANTITY_SOLD) as units_sold,
+                SUM(TOTAL_REVENUE) as revenue,
+                SUM(PROFIT) as profit
+            FROM MARTS_MARTS.VIZ_BASE
+            GROUP BY 1, 2
+            ORDER BY 4 DESC
+            LIMIT 10
+        """,
+        'store_performance': """
+            SELECT 
+                STORE_TYPE,
+                REGION,
+                SUM(TOTAL_REVENUE) as revenue
+            FROM MARTS_MARTS.VIZ_BASE
+            GROUP BY GROUPING SETS ((STORE_TYPE), (REGION))
+            ORDER BY 3 DESC
+        """,
+        'profit_analysis': """
+            SELECT 
+                CATEGORY,
+                SUBCATEGORY,
+                SUM(TOTAL_REVENUE) as revenue,
+                SUM(PROFIT) as profit,
+                SUM(PROFIT) / NULLIF(SUM(TOTAL_REVENUE), 0) * 100 as profit_margin_pct
+            FROM MARTS_MARTS.VIZ_BASE
+            GROUP BY 1, 2
+            HAVING SUM(TOTAL_REVENUE) > 10000
+            ORDER BY 5 DESC
+            LIMIT 15
+        """,
+    }
+    
+    # Bump whenever the chart drawing code changes (layout, dpi, colours), so
+    # PNGs rendered by older code are redrawn even when their data is unchanged
+    RENDER_VERSION = 1
+    
     def __init__(self, config_path: str = "config/config.yaml"):
         """Initialize with Snowflake connection."""
         self.config = self._load_config(config_path)
         self.output_dir = Path("dashboards/screenshots")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Snowflake connection shared by every query this visualizer runs
+        self._conn = None
+    
+    def __getstate__(self):
+        """Pickle without the Snowflake connection (render workers don't query)."""
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        return state
     
     def _load_config(self, config_path: str) -> dict:
         """Load Snowflake config."""
@@ -51,297 +158,290 @@ class SupplyChainVisualizer:
             return yaml.safe_load(f)['snowflake']
     
     def connect_snowflake(self):
-        """Connect to Snowflake."""
-        return snowflake.connector.connect(
-            user=self.config['user'],
-            password=self.config['password'],
-            account=self.config['account'],
-            warehouse=self.config['warehouse'],
-            database=self.config['database'],
-            insecure_mode=True
-        )
+        """Connect to Snowflake, reusing the open connection if there is one."""
+        if self._conn is None or self._conn.is_closed():
+            self._conn = snowflake.connector.connect(
+                user=self.config['user'],
+                password=self.config['password'],
+                account=self.config['account'],
+                warehouse=self.config['warehouse'],
+                database=self.config['database'],
+                insecure_mode=True,
+                client_session_keep_alive=True
+            )
+        return self._conn
+    
+    def close(self):
+        """Close the shared Snowflake connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
     
     def query_data(self, query: str) -> pd.DataFrame:
         """Execute query and return DataFrame."""
-        conn = self.connect_snowflake()
-        df = pd.read_sql(query, conn)
-        conn.close()
-        return df
+        return self.query_many([query])[0]
     
-    def chart_1_executive_kpis(self):
-        """KPI Summary Card."""
-        logger.info("Creating Chart 1: Executive KPIs...")
+    def query_many(self, queries: list, setup: list = ()) -> list:
+        """
+        Execute several queries as one multi-statement request on a single
+        connection and return one DataFrame per query, in order.
         
-        query = """
-        SELECT 
-            SUM(TOTAL_REVENUE) as total_revenue,
-            SUM(PROFIT) as total_profit,
-            COUNT(DISTINCT SALES_KEY) as total_transactions,
-            AVG(TOTAL_REVENUE) as avg_transaction,
-            SUM(PROFIT) / SUM(TOTAL_REVENUE) * 100 as profit_margin_pct
-        FROM MARTS_MARTS.FACT_SALES
+        Statements in setup run first in the same request; their results
+        are discarded. Query results are fetched as Arrow batches.
         """
+        return list(self.iter_query_results(queries, setup))
+    
+    def iter_query_results(self, queries: list, setup: list = ()):
+        """Like query_many, but yield each DataFrame as soon as it is fetched."""
+        statements = [*setup, *queries]
+        with self.connect_snowflake().cursor() as cursor:
+            cursor.execute(";\n".join(statements), num_statements=len(statements))
+            for _ in setup:
+                cursor.fetchall()
+                cursor.nextset()
+            for _ in queries:
+                yield cursor.fetch_pandas_all()
+                cursor.nextset()
+    
+    def iter_chart_data(self):
+        """
+        Build the shared base table, then every chart's aggregate, in one
+        round trip. Yields (CHART_QUERIES key, DataFrame) pairs as each
+        result set is fetched.
+        """
+        frames = self.iter_query_results(
+            list(self.CHART_QUERIES.values()), setup=[self.BASE_TABLE_SQL]
+        )
+        for name, df in zip(self.CHART_QUERIES, frames):
+            # Integer-coded labels for the pivots, masks and lookups downstream
+            for col in self.CATEGORICAL_COLUMNS:
+                if col in df:
+                    df[col] = df[col].astype('category')
+            yield name, df
+    
+    def fetch_all(self) -> dict:
+        """All of iter_chart_data's DataFrames, keyed like CHART_QUERIES."""
+        return dict(self.iter_chart_data())
+    
+    def render_all(self, data):
+        """
+        Render every chart, each in its own process (rasterizing is CPU-bound
+        and the charts are independent).
         
-        df = self.query_data(query)
-        
-        fig, axes = plt.subplots(2, 3, figsize=(16, 8))
-        fig.suptitle('Supply Chain Analytics - Executive KPIs', fontsize=20, fontweight='bold', y=0.98)
-        
-        # KPI 1: Total Revenue
-        axes[0, 0].text(0.5, 0.6, f"${df['TOTAL_REVENUE'].iloc[0]:,.0f}", 
-                       ha='center', va='center', fontsize=36, fontweight='bold', color=COLORS['primary'])
-        axes[0, 0].text(0.5, 0.3, 'Total Revenue', 
-                       ha='center', va='center', fontsize=14, color='gray')
-        axes[0, 0].axis('off')
-        
-        # KPI 2: Total Profit
-        axes[0, 1].text(0.5, 0.6, f"${df['TOTAL_PROFIT'].iloc[0]:,.0f}", 
-                       ha='center', va='center', fontsize=36, fontweight='bold', color=COLORS['success'])
-        axes[0, 1].text(0.5, 0.3, 'Total Profit', 
-                       ha='center', va='center', fontsize=14, color='gray')
-        axes[0, 1].axis('off')
-        
-        # KPI 3: Transactions
-        axes[0, 2].text(0.5, 0.6, f"{int(df['TOTAL_TRANSACTIONS'].iloc[0]):,}", 
-                       ha='center', va='center', fontsize=36, fontweight='bold', color=COLORS['secondary'])
-        axes[0, 2].text(0.5, 0.3, 'Total Transactions', 
-                       ha='center', va='center', fontsize=14, color='gray')
-        axes[0, 2].axis('off')
-        
-        # KPI 4: Avg Transaction
-        axes[1, 0].text(0.5, 0.6, f"${df['AVG_TRANSACTION'].iloc[0]:,.2f}", 
-                       ha='center', va='center', fontsize=36, fontweight='bold', color=COLORS['warning'])
-        axes[1, 0].text(0.5, 0.3, 'Avg Transaction Value', 
-                       ha='center', va='center', fontsize=14, color='gray')
-        axes[1, 0].axis('off')
-        
-        # KPI 5: Profit Margin
-        axes[1, 1].text(0.5, 0.6, f"{df['PROFIT_MARGIN_PCT'].iloc[0]:.1f}%", 
-                       ha='center', va='center', fontsize=36, fontweight='bold', color=COLORS['success'])
-        axes[1, 1].text(0.5, 0.3, 'Profit Margin', 
-                       ha='center', va='center', fontsize=14, color='gray')
-        axes[1, 1].axis('off')
+        data is a dict or an iterable of (name, DataFrame) pairs, such as
+        iter_chart_data(); each chart is submitted as soon as its pair
+        arrives, so rendering overlaps fetching the remaining results.
+        
+        A chart whose PNG was last rendered from identical data by the same
+        RENDER_VERSION (per the digest in its .sha sidecar file) is skipped.
+        """
+        charts = {
+            'executive_kpis': (self.chart_1_executive_kpis, '01_executive_kpis.png'),
+            'revenue_trend': (self.chart_2_revenue_trend, '02_revenue_trend.png'),
+            'category_performance': (self.chart_3_category_performance, '03_category_performance.png'),
+            'top_products': (self.chart_4_top_products, '04_top_products.png'),
+            'store_performance': (self.chart_5_store_performance, '05_store_performance.png'),
+            'profit_analysis': (self.chart_6_profit_analysis, '06_profit_analysis.png'),
+        }
+        items = data.items() if isinstance(data, dict) else data
+        with ProcessPoolExecutor(max_workers=len(charts)) as executor:
+            pending = []
+            for name, df in items:
+                chart, filename = charts[name]
+                png = self.output_dir / filename
+                sidecar = png.with_name(png.name + '.sha')
+                digest = self._frame_digest(df)
+                if png.exists() and sidecar.exists() and sidecar.read_text() == digest:
+                    logger.info(f"⏭️  Unchanged: {filename}")
+                    continue
+                pending.append((executor.submit(chart, df), sidecar, digest))
+            
+            for future, sidecar, digest in pending:
+                future.result()
+                sidecar.write_text(digest)
+    
+    def _frame_digest(self, df: pd.DataFrame) -> str:
+        """BLAKE2b digest of RENDER_VERSION and a DataFrame's column names and values."""
+        digest = hashlib.blake2b(f"v{self.RENDER_VERSION}|{','.join(df.columns)}".encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+    
+    def chart_1_executive_kpis(self, df: pd.DataFrame):
+        """KPI Summary Card."""
+        logger.info("Creating Chart 1: Executive KPIs...")
+        
+        fig = plt.figure(figsize=(16, 8), constrained_layout=True)
+        fig.suptitle('Supply Chain Analytics - Executive KPIs', fontsize=20, fontweight='bold')
+        
+        # Text is placed straight on the figure in a 2x3 grid of cells below
+        # the title; (x, y) are positions within a cell, as in axes coords
+        def cell(row, col, x, y):
+            return (col + x) / 3, 0.92 * (1 - (row + 1 - y) / 2)
+        
+        kpis = [
+            (f"${df['TOTAL_REVENUE'].iloc[0]:,.0f}", 'Total Revenue', COLORS['primary']),
+            (f"${df['TOTAL_PROFIT'].iloc[0]:,.0f}", 'Total Profit', COLORS['success']),
+            (f"{int(df['TOTAL_TRANSACTIONS'].iloc[0]):,}", 'Total Transactions', COLORS['secondary']),
+            (f"${df['AVG_TRANSACTION'].iloc[0]:,.2f}", 'Avg Transaction Value', COLORS['warning']),
+            (f"{df['PROFIT_MARGIN_PCT'].iloc[0]:.1f}%", 'Profit Margin', COLORS['success']),
+        ]
+        for i, (value, label, color) in enumerate(kpis):
+            row, col = divmod(i, 3)
+            fig.text(*cell(row, col, 0.5, 0.6), value,
+                     ha='center', va='center', fontsize=36, fontweight='bold', color=color)
+            fig.text(*cell(row, col, 0.5, 0.3), label,
+                     ha='center', va='center', fontsize=14, color='gray')
         
         # Info panel
-        axes[1, 2].text(0.5, 0.7, '3 Months of Data', ha='center', fontsize=12, fontweight='bold')
-        axes[1, 2].text(0.5, 0.5, 'Nov 2025 - Feb 2026', ha='center', fontsize=10, color='gray')
-        axes[1, 2].text(0.5, 0.3, '100 Products | 10 Stores', ha='center', fontsize=10, color='gray')
-        axes[1, 2].axis('off')
+        fig.text(*cell(1, 2, 0.5, 0.7), '3 Months of Data', ha='center', fontsize=12, fontweight='bold')
+        fig.text(*cell(1, 2, 0.5, 0.5), 'Nov 2025 - Feb 2026', ha='center', fontsize=10, color='gray')
+        fig.text(*cell(1, 2, 0.5, 0.3), '100 Products | 10 Stores', ha='center', fontsize=10, color='gray')
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / '01_executive_kpis.png', dpi=300, bbox_inches='tight')
+        plt.savefig(self.output_dir / '01_executive_kpis.png', dpi=150,
+                    pil_kwargs={'optimize': True, 'compress_level': 6})
         plt.close()
         logger.info("✅ Saved: 01_executive_kpis.png")
     
-    def chart_2_revenue_trend(self):
+    def chart_2_revenue_trend(self, df: pd.DataFrame):
         """Revenue trend over time."""
         logger.info("Creating Chart 2: Revenue Trend...")
         
-        query = """
-        SELECT 
-            DATE_TRUNC('MONTH', s.SALE_DATE) as month,
-            p.CATEGORY,
-            SUM(s.TOTAL_REVENUE) as revenue
-        FROM MARTS_MARTS.FACT_SALES s
-        JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
-        GROUP BY 1, 2
-        ORDER BY 1, 2
-        """
-        
-        df = self.query_data(query)
         df['MONTH'] = pd.to_datetime(df['MONTH'])
         
-        plt.figure(figsize=(14, 6))
-        
-        for category in df['CATEGORY'].unique():
-            cat_data = df[df['CATEGORY'] == category]
-            plt.plot(cat_data['MONTH'], cat_data['REVENUE'], marker='o', linewidth=2.5, label=category)
+        # One column per category, drawn in a single plot call
+        wide = df.pivot(index='MONTH', columns='CATEGORY', values='REVENUE')
+        fig, ax = plt.subplots(figsize=(14, 6), constrained_layout=True)
+        wide.plot(ax=ax, marker='o', linewidth=2.5)
         
         plt.title('Revenue Trend by Product Category', fontsize=18, fontweight='bold', pad=20)
         plt.xlabel('Month', fontsize=12, fontweight='bold')
         plt.ylabel('Revenue ($)', fontsize=12, fontweight='bold')
         plt.legend(title='Category', title_fontsize=11, fontsize=10, loc='best')
         plt.grid(True, alpha=0.3)
-        plt.tight_layout()
         
-        plt.savefig(self.output_dir / '02_revenue_trend.png', dpi=300, bbox_inches='tight')
+        plt.savefig(self.output_dir / '02_revenue_trend.png', dpi=150,
+                    pil_kwargs={'optimize': True, 'compress_level': 6})
         plt.close()
         logger.info("✅ Saved: 02_revenue_trend.png")
     
-    def chart_3_category_performance(self):
+    def chart_3_category_performance(self, df: pd.DataFrame):
         """Sales by category bar chart."""
         logger.info("Creating Chart 3: Category Performance...")
         
-        query = """
-        SELECT 
-            p.CATEGORY,
-            SUM(s.TOTAL_REVENUE) as revenue,
-            SUM(s.PROFIT) as profit,
-            COUNT(DISTINCT s.SALES_KEY) as transactions
-        FROM MARTS_MARTS.FACT_SALES s
-        JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
-        GROUP BY 1
-        ORDER BY 2 DESC
-        """
-        
-        df = self.query_data(query)
-        
-        fig, axes = plt.subplots(1, 2, figsize=(16, 6))
-        
-        # Revenue by category
-        axes[0].barh(df['CATEGORY'], df['REVENUE'], color=COLORS['primary'], alpha=0.8)
-        axes[0].set_xlabel('Revenue ($)', fontsize=12, fontweight='bold')
-        axes[0].set_title('Revenue by Category', fontsize=14, fontweight='bold')
-        axes[0].grid(axis='x', alpha=0.3)
-        
-        # Add value labels
-        for i, v in enumerate(df['REVENUE']):
-            axes[0].text(v, i, f' ${v:,.0f}', va='center', fontsize=10)
-        
-        # Profit by category
-        axes[1].barh(df['CATEGORY'], df['PROFIT'], color=COLORS['success'], alpha=0.8)
-        axes[1].set_xlabel('Profit ($)', fontsize=12, fontweight='bold')
-        axes[1].set_title('Profit by Category', fontsize=14, fontweight='bold')
-        axes[1].grid(axis='x', alpha=0.3)
-        
-        for i, v in enumerate(df['PROFIT']):
-            axes[1].text(v, i, f' ${v:,.0f}', va='center', fontsize=10)
+        # Revenue and profit by category, side by side from one plot call
+        fig, axes = plt.subplots(1, 2, figsize=(16, 6), constrained_layout=True)
+        df.set_index('CATEGORY')[['REVENUE', 'PROFIT']].plot.barh(
+            subplots=True, ax=axes, sharex=False, legend=False,
+            color=[COLORS['primary'], COLORS['success']], alpha=0.8
+        )
         
-        plt.suptitle('Category Performance Analysis', fontsize=18, fontweight='bold', y=1.02)
-        plt.tight_layout()
-        plt.savefig(self.output_dir / '03_category_performance.png', dpi=300, bbox_inches='tight')
+        for ax, label in zip(axes, ['Revenue', 'Profit']):
+            ax.set_xlabel(f'{label} ($)', fontsize=12, fontweight='bold')
+            ax.set_ylabel('')
+            ax.set_title(f'{label} by Category', fontsize=14, fontweight='bold')
+            ax.grid(axis='x', alpha=0.3)
+            
+            # Add value labels
+            ax.bar_label(ax.containers[0], fmt='${:,.0f}', padding=3, fontsize=10)
+        
+        plt.suptitle('Category Performance Analysis', fontsize=18, fontweight='bold')
+        plt.savefig(self.output_dir / '03_category_performance.png', dpi=150,
+                    pil_kwargs={'optimize': True, 'compress_level': 6})
         plt.close()
         logger.info("✅ Saved: 03_category_performance.png")
     
-    def chart_4_top_products(self):
+    def chart_4_top_products(self, df: pd.DataFrame):
         """Top 10 products by revenue."""
         logger.info("Creating Chart 4: Top Products...")
         
-        query = """
-        SELECT 
-            p.PRODUCT_NAME,
-            p.CATEGORY,
-            SUM(s.QUANTITY_SOLD) as units_sold,
-            SUM(s.TOTAL_REVENUE) as revenue,
-            SUM(s.PROFIT) as profit
-        FROM MARTS_MARTS.FACT_SALES s
-        JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
-        GROUP BY 1, 2
-        ORDER BY 4 DESC
-        LIMIT 10
-        """
+        revenue = df['REVENUE'].to_numpy()
+        categories = df['CATEGORY'].to_numpy()
+        names = df['PRODUCT_NAME'].to_numpy()
         
-        df = self.query_data(query)
-        
-        fig, ax = plt.subplots(figsize=(14, 8))
+        fig, ax = plt.subplots(figsize=(14, 8), constrained_layout=True)
         
         # Create bars
-        bars = ax.barh(range(len(df)), df['REVENUE'], color=COLORS['primary'], alpha=0.8)
-        
-        # Color code by category
-        category_colors = {cat: COLORS[key] for cat, key in zip(
-            df['CATEGORY'].unique(), ['primary', 'success', 'warning', 'secondary', 'danger']
-        )}
-        for i, (idx, row) in enumerate(df.iterrows()):
-            bars[i].set_color(category_colors.get(row['CATEGORY'], COLORS['primary']))
-        
-        ax.set_yticks(range(len(df)))
-        ax.set_yticklabels([name[:40] + '...' if len(name) > 40 else name for name in df['PRODUCT_NAME']], fontsize=10)
+        bars = ax.barh(range(len(revenue)), revenue, color=COLORS['primary'], alpha=0.8)
+        
+        # Color code by category, in order of first appearance
+        cats = pd.unique(categories).tolist()
+        category_colors = dict(zip(
+            cats, [COLORS[key] for key in ['primary', 'success', 'warning', 'secondary', 'danger']]
+        ))
+        for bar, category in zip(bars, categories):
+            bar.set_color(category_colors.get(category, COLORS['primary']))
+        
+        ax.set_yticks(range(len(names)))
+        ax.set_yticklabels([name[:40] + '...' if len(name) > 40 else name for name in names], fontsize=10)
         ax.set_xlabel('Revenue ($)', fontsize=12, fontweight='bold')
         ax.set_title('Top 10 Products by Revenue', fontsize=18, fontweight='bold', pad=20)
         ax.grid(axis='x', alpha=0.3)
         
         # Add value labels
-        for i, v in enumerate(df['REVENUE']):
-            ax.text(v, i, f' ${v:,.0f}', va='center', fontsize=9)
+        ax.bar_label(bars, fmt='${:,.0f}', padding=3, fontsize=9)
         
         # Legend for categories
         from matplotlib.patches import Patch
         legend_elements = [Patch(facecolor=category_colors[cat], label=cat) 
-                          for cat in df['CATEGORY'].unique()]
+                          for cat in cats if cat in category_colors]
         ax.legend(handles=legend_elements, title='Category', loc='lower right', fontsize=9)
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / '04_top_products.png', dpi=300, bbox_inches='tight')
+        plt.savefig(self.output_dir / '04_top_products.png', dpi=150,
+                    pil_kwargs={'optimize': True, 'compress_level': 6})
         plt.close()
         logger.info("✅ Saved: 04_top_products.png")
     
-    def chart_5_store_performance(self):
+    def chart_5_store_performance(self, df: pd.DataFrame):
         """Store performance analysis."""
         logger.info("Creating Chart 5: Store Performance...")
         
-        query = """
-        SELECT 
-            st.STORE_TYPE,
-            st.REGION,
-            SUM(s.TOTAL_REVENUE) as revenue,
-            SUM(s.PROFIT) as profit,
-            COUNT(DISTINCT s.SALES_KEY) as transactions
-        FROM MARTS_MARTS.FACT_SALES s
-        JOIN MARTS_MARTS.DIM_STORES st ON s.STORE_KEY = st.STORE_KEY
-        GROUP BY 1, 2
-        ORDER BY 3 DESC
-        """
-        
-        df = self.query_data(query)
+        fig, axes = plt.subplots(1, 2, figsize=(16, 6), constrained_layout=True)
         
-        fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+        # One row per store type and one per region, already summed and
+        # sorted by revenue (descending) in Snowflake
+        by_store_type = df['STORE_TYPE'].notna()
         
         # Revenue by store type
-        store_type_revenue = df.groupby('STORE_TYPE')['REVENUE'].sum().sort_values(ascending=False)
+        store_type_revenue = df[by_store_type].set_index('STORE_TYPE')['REVENUE']
         colors_list = [COLORS['primary'], COLORS['success'], COLORS['warning']]
         axes[0].pie(store_type_revenue.values, labels=store_type_revenue.index, autopct='%1.1f%%',
                    colors=colors_list, startangle=90, textprops={'fontsize': 11, 'fontweight': 'bold'})
         axes[0].set_title('Revenue by Store Type', fontsize=14, fontweight='bold')
         
         # Revenue by region
-        region_revenue = df.groupby('REGION')['REVENUE'].sum().sort_values(ascending=True)
-        axes[1].barh(region_revenue.index, region_revenue.values, color=COLORS['secondary'], alpha=0.8)
+        region_revenue = df[~by_store_type].set_index('REGION')['REVENUE'].iloc[::-1]
+        region_bars = axes[1].barh(region_revenue.index, region_revenue.values, color=COLORS['secondary'], alpha=0.8)
         axes[1].set_xlabel('Revenue ($)', fontsize=12, fontweight='bold')
         axes[1].set_title('Revenue by Region', fontsize=14, fontweight='bold')
         axes[1].grid(axis='x', alpha=0.3)
         
-        for i, v in enumerate(region_revenue.values):
-            axes[1].text(v, i, f' ${v:,.0f}', va='center', fontsize=10)
+        axes[1].bar_label(region_bars, fmt='${:,.0f}', padding=3, fontsize=10)
         
-        plt.suptitle('Store & Regional Performance', fontsize=18, fontweight='bold', y=1.02)
-        plt.tight_layout()
-        plt.savefig(self.output_dir / '05_store_performance.png', dpi=300, bbox_inches='tight')
+        plt.suptitle('Store & Regional Performance', fontsize=18, fontweight='bold')
+        plt.savefig(self.output_dir / '05_store_performance.png', dpi=150,
+                    pil_kwargs={'optimize': True, 'compress_level': 6})
         plt.close()
         logger.info("✅ Saved: 05_store_performance.png")
     
-    def chart_6_profit_analysis(self):
+    def chart_6_profit_analysis(self, df: pd.DataFrame):
         """Profit margin analysis."""
         logger.info("Creating Chart 6: Profit Analysis...")
         
-        query = """
-        SELECT 
-            p.CATEGORY,
-            p.SUBCATEGORY,
-            SUM(s.TOTAL_REVENUE) as revenue,
-            SUM(s.PROFIT) as profit,
-            SUM(s.PROFIT) / NULLIF(SUM(s.TOTAL_REVENUE), 0) * 100 as profit_margin_pct
-        FROM MARTS_MARTS.FACT_SALES s
-        JOIN MARTS_MARTS.DIM_PRODUCTS p ON s.PRODUCT_KEY = p.PRODUCT_KEY
-        GROUP BY 1, 2
-        HAVING SUM(s.TOTAL_REVENUE) > 10000
-        ORDER BY 5 DESC
-        LIMIT 15
-        """
-        
-        df = self.query_data(query)
+        revenue = df['REVENUE'].to_numpy()
+        margins = df['PROFIT_MARGIN_PCT'].to_numpy()
+        avg_margin = margins.mean()
         
-        plt.figure(figsize=(14, 8))
+        plt.figure(figsize=(14, 8), constrained_layout=True)
         
         # Create scatter plot
-        scatter = plt.scatter(df['REVENUE'], df['PROFIT_MARGIN_PCT'], 
-                            s=df['PROFIT']/50, alpha=0.6, 
+        scatter = plt.scatter(revenue, margins, 
+                            s=df['PROFIT'].to_numpy()/50, alpha=0.6, 
                             c=range(len(df)), cmap='viridis')
         
         # Add labels for top performers
-        for idx, row in df.head(5).iterrows():
-            plt.annotate(row['SUBCATEGORY'], 
-                        xy=(row['REVENUE'], row['PROFIT_MARGIN_PCT']),
+        for subcategory, rev, margin in zip(df['SUBCATEGORY'].to_numpy()[:5], revenue[:5], margins[:5]):
+            plt.annotate(subcategory, 
+                        xy=(rev, margin),
                         xytext=(10, 10), textcoords='offset points',
                         fontsize=9, bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.3))
         
@@ -351,12 +451,12 @@ class SupplyChainVisualizer:
         plt.grid(True, alpha=0.3)
         
         # Add reference lines
-        plt.axhline(y=df['PROFIT_MARGIN_PCT'].mean(), color='red', linestyle='--', 
-                   linewidth=1.5, alpha=0.7, label=f"Avg Margin: {df['PROFIT_MARGIN_PCT'].mean():.1f}%")
+        plt.axhline(y=avg_margin, color='red', linestyle='--', 
+                   linewidth=1.5, alpha=0.7, label=f"Avg Margin: {avg_margin:.1f}%")
         plt.legend(fontsize=10)
         
-        plt.tight_layout()
-        plt.savefig(self.output_dir / '06_profit_analysis.png', dpi=300, bbox_inches='tight')
+        plt.savefig(self.output_dir / '06_profit_analysis.png', dpi=150,
+                    pil_kwargs={'optimize': True, 'compress_level': 6})
         plt.close()
         logger.info("✅ Saved: 06_profit_analysis.png")
     
@@ -365,12 +465,10 @@ class SupplyChainVisualizer:
         logger.info("\n🎨 Starting visualization generation...")
         logger.info(f"Output directory: {self.output_dir}\n")
         
-        self.chart_1_executive_kpis()
-        self.chart_2_revenue_trend()
-        self.chart_3_category_performance()
-        self.chart_4_top_products()
-        self.chart_5_store_performance()
-        self.chart_6_profit_analysis()
+        try:
+            self.render_all(self.iter_chart_data())
+        finally:
+            self.close()
         
         logger.info("\n✅ ✅ ✅ ALL CHARTS GENERATED! ✅ ✅ ✅")
         logger.info(f"\n📁 Saved 6 charts to: {self.output_dir}")